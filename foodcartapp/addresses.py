@@ -0,0 +1,60 @@
+import re
+
+ABBREVIATIONS = {
+    'г': 'город',
+    'гор': 'город',
+    'обл': 'область',
+    'р-н': 'район',
+    'мкр': 'микрорайон',
+    'мкрн': 'микрорайон',
+    'пос': 'поселок',
+    'ул': 'улица',
+    'пр': 'проспект',
+    'пр-т': 'проспект',
+    'просп': 'проспект',
+    'пр-д': 'проезд',
+    'пер': 'переулок',
+    'пл': 'площадь',
+    'б-р': 'бульвар',
+    'бул': 'бульвар',
+    'наб': 'набережная',
+    'ш': 'шоссе',
+    'туп': 'тупик',
+    'к': 'корпус',
+    'корп': 'корпус',
+    'стр': 'строение',
+    'кв': 'квартира',
+}
+
+NOISE_WORDS = {'д', 'дом'}
+
+TOKEN_RE = re.compile(r'[^\s.,;:()\[\]"\'«»№#]+')
+BUILDING_RE = re.compile(r'(\d+)(к|корп|стр)(\d+)')
+
+
+def normalize_address(address):
+    '''
+    Canonical form of an address used as the lookup key for places:
+    «ул. Ленина, д. 5А» and «улица  ленина 5 а» both become «улица ленина 5а».
+    '''
+    tokens = []
+    for token in TOKEN_RE.findall(address.casefold().replace('ё', 'е')):
+        building = BUILDING_RE.fullmatch(token)
+        if building:
+            house, building_type, building_number = building.groups()
+            tokens.extend([house, ABBREVIATIONS[building_type], building_number])
+            continue
+
+        if token in ABBREVIATIONS:
+            tokens.append(ABBREVIATIONS[token])
+            continue
+
+        for part in token.split('-'):
+            if not part or part in NOISE_WORDS:
+                continue
+            if tokens and tokens[-1].isdigit() and len(part) == 1 and part.isalpha() and part not in ABBREVIATIONS:
+                tokens[-1] += part
+                continue
+            tokens.append(ABBREVIATIONS.get(part, part))
+
+    return ' '.join(tokens)
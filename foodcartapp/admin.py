@@ -6,8 +6,9 @@ from django.utils.http import url_has_allowed_host_and_scheme
 
 from star_burger.settings import ALLOWED_HOSTS
 
-from .models import (Order, OrderProduct, Place, Product, ProductCategory,
-                     Restaurant, RestaurantMenuItem)
+from .geo_services import enqueue_places_refresh, enqueue_restaurants_geocoding
+from .models import (GeocoderFailure, Job, Order, OrderProduct, Place, Product,
+                     ProductCategory, Restaurant, RestaurantMenuItem)
 
 
 class RestaurantMenuItemInline(admin.TabularInline):
@@ -26,10 +27,20 @@ class RestaurantAdmin(admin.ModelAdmin):
         'name',
         'address',
         'contact_phone',
+        'latitude',
+        'longitude',
     ]
     inlines = [
         RestaurantMenuItemInline
     ]
+    actions = [
+        'geocode_restaurants',
+    ]
+
+    def geocode_restaurants(self, request, queryset):
+        enqueue_restaurants_geocoding(queryset.only('id'))
+        self.message_user(request, f'Ресторанов поставлено в очередь на геокодирование: {queryset.count()}')
+    geocode_restaurants.short_description = 'Определить координаты'
 
 
 @admin.register(Product)
@@ -118,6 +129,10 @@ class OrderAdmin(admin.ModelAdmin):
     inlines = [
         OrderProductInline
     ]
+    readonly_fields = [
+        'place',
+        'candidates_updated_at',
+    ]
 
     def response_change(self, request, obj):
         res = super(OrderAdmin, self).response_change(request, obj)
@@ -129,4 +144,57 @@ class OrderAdmin(admin.ModelAdmin):
 
 @admin.register(Place)
 class PlaceAdmin(admin.ModelAdmin):
-    pass
+    list_display = [
+        'address',
+        'latitude',
+        'longitude',
+        'request_to_geocoder_at',
+    ]
+    search_fields = [
+        'address',
+    ]
+    readonly_fields = [
+        'canonical_address',
+    ]
+    actions = [
+        'refresh_coordinates',
+    ]
+
+    def refresh_coordinates(self, request, queryset):
+        enqueue_places_refresh(queryset.only('id', 'canonical_address'))
+        self.message_user(request, f'Мест поставлено в очередь на обновление координат: {queryset.count()}')
+    refresh_coordinates.short_description = 'Обновить координаты'
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = [
+        'name',
+        'key',
+        'status',
+        'attempts',
+        'run_after',
+    ]
+    list_filter = [
+        'name',
+        'status',
+    ]
+    search_fields = [
+        'key',
+    ]
+
+
+@admin.register(GeocoderFailure)
+class GeocoderFailureAdmin(admin.ModelAdmin):
+    list_display = [
+        'address',
+        'reason',
+        'failed_at',
+        'expires_at',
+    ]
+    list_filter = [
+        'reason',
+    ]
+    search_fields = [
+        'address',
+    ]
@@ -0,0 +1,114 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .changes import publish_order_changes
+from .eligibility import get_eligibility_index
+from .geo_services import get_cached_distances, save_distances
+from .jobs import enqueue
+from .models import Order, OrderCandidate, OrderProduct
+from .spatial import get_restaurant_index
+
+
+def calculate_candidates(orders):
+    '''
+    Restaurants able to cook every order: {order id: [(restaurant, km)]}, nearest first.
+    Restaurants without coordinates go last with unknown distance, as do all restaurants for orders without a place.
+    '''
+    restaurant_index = get_restaurant_index()
+    eligibility_index = get_eligibility_index()
+
+    products_ids = defaultdict(list)
+    order_items = OrderProduct.objects.filter(order__in=orders).values_list('order_id', 'product_id')
+    for order_id, product_id in order_items:
+        products_ids[order_id].append(product_id)
+
+    cached_distances = get_cached_distances(order.place_id for order in orders if order.place)
+    new_distances = defaultdict(dict)
+
+    candidates = {}
+    for order in orders:
+        eligible_ids = eligibility_index.eligible_ids(products_ids[order.id])
+
+        if order.place:
+            order_point = (order.place.latitude, order.place.longitude)
+            eligible_ids &= restaurant_index.delivering_ids(order_point)
+            order_distances = cached_distances[order.place_id]
+            nearest_restaurants = restaurant_index.nearest(
+                order_point,
+                k=settings.ORDER_RESTAURANTS_LIMIT,
+                radius_km=settings.ORDER_RESTAURANTS_RADIUS_KM,
+                eligible_ids=eligible_ids,
+                known_distances=order_distances,
+            )
+            for restaurant, distance in nearest_restaurants:
+                if restaurant.id not in order_distances:
+                    order_distances[restaurant.id] = new_distances[order.place_id][restaurant.id] = distance
+            unlocated_restaurants = restaurant_index.unlocated_restaurants
+        else:
+            nearest_restaurants = []
+            unlocated_restaurants = restaurant_index.restaurants
+
+        candidates[order.id] = nearest_restaurants + [
+            (restaurant, None) for restaurant in unlocated_restaurants if restaurant.id in eligible_ids
+        ]
+
+    save_distances(new_distances)
+    return candidates
+
+
+def refresh_candidates(orders):
+    '''
+    Recalculate and save candidate restaurants of orders. Returns the number of refreshed orders.
+    '''
+    orders = list(orders)
+    if not orders:
+        return 0
+
+    candidates = calculate_candidates(orders)
+    refreshed_at = timezone.now()
+    with transaction.atomic():
+        OrderCandidate.objects.filter(order__in=orders).delete()
+        OrderCandidate.objects.bulk_create(
+            [
+                OrderCandidate(order_id=order_id, restaurant=restaurant, distance=distance)
+                for order_id, order_candidates in candidates.items()
+                for restaurant, distance in order_candidates
+            ],
+            ignore_conflicts=True,
+        )
+        Order.objects.filter(id__in=candidates.keys()).update(candidates_updated_at=refreshed_at)
+        publish_order_changes(candidates.keys())
+
+    for order in orders:
+        order.candidates_updated_at = refreshed_at
+    return len(orders)
+
+
+def get_affected_orders(products_ids=(), places_ids=(), all_orders=False):
+    '''
+    Open orders whose candidates depend on the changed products, places or, with `all_orders`, restaurants.
+    '''
+    orders = Order.objects.filter(status='NEW').select_related('place')
+    if all_orders:
+        return orders
+    return orders.filter(
+        Q(id__in=OrderProduct.objects.filter(product_id__in=products_ids).values('order_id'))
+        | Q(place_id__in=places_ids)
+    )
+
+
+def enqueue_candidates_refresh(products_ids=(), places_ids=(), all_orders=False):
+    '''
+    Nothing is queued when no open order is affected.
+    '''
+    payloads = {f'product:{product_id}': {'product_id': product_id} for product_id in products_ids}
+    payloads.update({f'place:{place_id}': {'place_id': place_id} for place_id in places_ids})
+    if all_orders:
+        payloads['all'] = {'all_orders': True}
+
+    if payloads and get_affected_orders(products_ids, places_ids, all_orders).exists():
+        enqueue('refresh_candidates', payloads, coalesce_running=False)
@@ -0,0 +1,92 @@
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OrderChange
+
+
+class ChangeLog:
+    '''
+    Ids of changed orders numbered in the order of changes. They are kept in the OrderChange table,
+    so readers see changes made by every process: web servers and the job worker alike.
+    Event ids are ids of the table rows. Changes older than ORDER_CHANGES_RETENTION seconds
+    are purged, readers falling behind them are told to start over.
+    '''
+
+    def __init__(self, poll_interval=None):
+        self.poll_interval = poll_interval
+
+    @property
+    def last_event_id(self):
+        last_change = OrderChange.objects.order_by('-id').values_list('id', flat=True).first()
+        return str(last_change or 0)
+
+    def append(self, orders_ids):
+        OrderChange.objects.bulk_create([OrderChange(order_id=order_id) for order_id in orders_ids])
+
+    def get_since(self, event_id, timeout=None):
+        '''
+        Waits up to `timeout` seconds for changes after `event_id` and returns the last event id
+        with ids of changed orders. Returns None if the event id is malformed or some of these changes are purged.
+        '''
+        if not event_id.isdigit():
+            return None
+        number = int(event_id)
+        if number and not OrderChange.objects.filter(id__lte=number).exists():
+            return None
+
+        poll_interval = self.poll_interval or settings.ORDERS_FEED_POLL_INTERVAL
+        wait_until = time.monotonic() + (timeout or 0)
+        while True:
+            changes = list(OrderChange.objects.filter(id__gt=number).order_by('id').values_list('id', 'order_id'))
+            if changes:
+                return str(changes[-1][0]), list(dict.fromkeys(order_id for _, order_id in changes))
+            remaining = wait_until - time.monotonic()
+            if remaining <= 0:
+                return event_id, []
+            time.sleep(min(poll_interval, remaining))
+
+    def purge(self, older_than):
+        '''
+        Delete changes made more than `older_than` (a timedelta) ago. The last change is kept:
+        readers check that their event id has not been purged by looking for rows up to it.
+        '''
+        purged_changes = OrderChange.objects.filter(changed_at__lt=timezone.now() - older_than)
+        last_purged_id = purged_changes.order_by('-id').values_list('id', flat=True).first()
+        if last_purged_id is None:
+            return 0
+        last_id = int(self.last_event_id)
+        deleted, _ = OrderChange.objects.filter(id__lte=last_purged_id).exclude(id=last_id).delete()
+        return deleted
+
+
+order_changes = ChangeLog()
+
+
+def publish_order_changes(orders_ids):
+    '''
+    Changes are published once the current transaction commits, so readers never see rolled back ones.
+    Rows are inserted after the commit by a statement of their own, so a change with a greater id
+    is hardly ever committed before a change with a smaller one, which a reader would skip.
+    '''
+    orders_ids = list(orders_ids)
+    if orders_ids:
+        transaction.on_commit(lambda: order_changes.append(orders_ids))
+
+
+RESTAURANTS_VERSION_KEY = 'restaurants_version'
+
+
+def get_restaurants_version():
+    '''
+    Changes whenever a restaurant is saved or deleted. Kept in the Django cache to be shared between processes.
+    '''
+    return cache.get_or_set(RESTAURANTS_VERSION_KEY, lambda: uuid.uuid4().hex, timeout=None)
+
+
+def bump_restaurants_version():
+    cache.set(RESTAURANTS_VERSION_KEY, uuid.uuid4().hex, timeout=None)
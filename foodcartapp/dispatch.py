@@ -0,0 +1,82 @@
+from collections import defaultdict
+
+from django.conf import settings
+
+from .changes import publish_order_changes
+from .eligibility import get_eligibility_index
+from .load import load_counters
+from .models import Order, OrderProduct
+from .spatial import get_restaurant_index
+
+
+def choose_restaurant(point, products_ids, restaurant_index, eligibility_index, load, candidates_count=8):
+    '''
+    The eligible restaurant delivering to the point with the lowest score:
+    distance in km plus DISPATCH_LOAD_PENALTY_KM for every open order it already cooks.
+
+    Nearest restaurants are scored first; the search widens only while a farther restaurant
+    with the lowest load could still beat the best score.
+    '''
+    eligible_ids = eligibility_index.eligible_ids(products_ids) & restaurant_index.delivering_ids(point)
+    if not eligible_ids:
+        return
+    min_load = min(load.get(restaurant_id, 0) for restaurant_id in eligible_ids)
+    min_load_penalty = settings.DISPATCH_LOAD_PENALTY_KM * min_load
+
+    while True:
+        candidates = restaurant_index.nearest(
+            point, k=candidates_count, radius_km=settings.ORDER_RESTAURANTS_RADIUS_KM, eligible_ids=eligible_ids
+        )
+        best_restaurant, best_score = None, None
+        for restaurant, distance in candidates:
+            score = distance + settings.DISPATCH_LOAD_PENALTY_KM * load.get(restaurant.id, 0)
+            if best_score is None or score < best_score:
+                best_restaurant, best_score = restaurant, score
+
+        if len(candidates) < candidates_count or candidates[-1][1] + min_load_penalty >= best_score:
+            return best_restaurant
+        candidates_count *= 4
+
+
+def dispatch_orders(orders):
+    '''
+    Assign restaurants to new geocoded orders nobody has assigned yet. Returns dispatched orders.
+    '''
+    orders = [
+        order for order in orders if order.status == 'NEW' and order.place and not order.restaurant_id
+    ]
+    if not orders:
+        return []
+
+    restaurant_index = get_restaurant_index()
+    eligibility_index = get_eligibility_index()
+    load = load_counters.get()
+    products_ids = defaultdict(list)
+    order_items = OrderProduct.objects.filter(order__in=orders).values_list('order_id', 'product_id')
+    for order_id, product_id in order_items:
+        products_ids[order_id].append(product_id)
+
+    orders_by_restaurant = defaultdict(list)
+    for order in orders:
+        restaurant = choose_restaurant(
+            (order.place.latitude, order.place.longitude), products_ids[order.id], restaurant_index, eligibility_index, load
+        )
+        if restaurant:
+            orders_by_restaurant[restaurant].append(order)
+            load[restaurant.id] = load.get(restaurant.id, 0) + 1
+
+    dispatched_orders = []
+    for restaurant, restaurant_orders in orders_by_restaurant.items():
+        orders_ids = [order.id for order in restaurant_orders]
+        assigned_count = Order.objects.filter(id__in=orders_ids, restaurant=None).update(restaurant=restaurant)
+        if assigned_count < len(orders_ids):
+            assigned_ids = set(
+                Order.objects.filter(id__in=orders_ids, restaurant=restaurant).values_list('id', flat=True)
+            )
+            restaurant_orders = [order for order in restaurant_orders if order.id in assigned_ids]
+        for order in restaurant_orders:
+            order.restaurant = restaurant
+        load_counters.add(restaurant.id, len(restaurant_orders))
+        dispatched_orders.extend(restaurant_orders)
+    publish_order_changes(order.id for order in dispatched_orders)
+    return dispatched_orders
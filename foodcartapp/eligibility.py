@@ -0,0 +1,92 @@
+import threading
+import time
+
+from django.conf import settings
+
+from .models import RestaurantMenuItem
+
+
+class EligibilityIndex:
+    '''
+    For every product a bitmask of restaurants serving it right now, one bit per restaurant.
+    Restaurants able to cook an order are the AND of its products' masks.
+    '''
+
+    def __init__(self, menu_items=()):
+        self.bits = {}
+        self.restaurants_ids = []
+        self.masks = {}
+        self.lock = threading.Lock()
+        for restaurant_id, product_id, availability in menu_items:
+            self.set_availability(restaurant_id, product_id, availability)
+
+    def get_bit(self, restaurant_id):
+        bit = self.bits.get(restaurant_id)
+        if bit is None:
+            bit = self.bits[restaurant_id] = len(self.restaurants_ids)
+            self.restaurants_ids.append(restaurant_id)
+        return bit
+
+    def set_availability(self, restaurant_id, product_id, availability):
+        with self.lock:
+            restaurant_mask = 1 << self.get_bit(restaurant_id)
+            if availability:
+                self.masks[product_id] = self.masks.get(product_id, 0) | restaurant_mask
+            else:
+                self.masks[product_id] = self.masks.get(product_id, 0) & ~restaurant_mask
+
+    def get_mask(self, products_ids):
+        products_ids = set(products_ids)
+        if not products_ids:
+            return 0
+        mask = -1
+        for product_id in products_ids:
+            mask &= self.masks.get(product_id, 0)
+            if not mask:
+                break
+        return mask
+
+    def to_ids(self, mask):
+        restaurants_ids = self.restaurants_ids
+        return {restaurants_ids[bit] for bit, flag in enumerate(reversed(bin(mask)[2:])) if flag == '1'}
+
+    def eligible_ids(self, products_ids):
+        '''
+        Ids of restaurants having every product available.
+        '''
+        return self.to_ids(self.get_mask(products_ids))
+
+
+_eligibility_index = None
+_eligibility_index_built_at = None
+_eligibility_index_lock = threading.Lock()
+
+
+def get_eligibility_index():
+    '''
+    Menu changes made in this process are applied to the index in place,
+    it is rebuilt every RESTAURANT_INDEX_TTL seconds to notice changes made by other processes.
+    '''
+    global _eligibility_index, _eligibility_index_built_at
+
+    with _eligibility_index_lock:
+        index_age = time.monotonic() - (_eligibility_index_built_at or 0)
+        if _eligibility_index is not None and index_age < settings.RESTAURANT_INDEX_TTL:
+            return _eligibility_index
+
+        menu_items = RestaurantMenuItem.objects.values_list('restaurant_id', 'product_id', 'availability')
+        _eligibility_index = EligibilityIndex(menu_items)
+        _eligibility_index_built_at = time.monotonic()
+        return _eligibility_index
+
+
+def update_eligibility(restaurant_id, product_id, availability):
+    with _eligibility_index_lock:
+        if _eligibility_index is not None:
+            _eligibility_index.set_availability(restaurant_id, product_id, availability)
+
+
+def invalidate_eligibility_index():
+    global _eligibility_index
+    with _eligibility_index_lock:
+        _eligibility_index = None
@@ -0,0 +1,178 @@
+import csv
+import re
+import threading
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from .addresses import normalize_address
+
+STREET_TYPES = {
+    'улица', 'проспект', 'проезд', 'переулок', 'площадь', 'бульвар', 'набережная', 'шоссе', 'тупик',
+    'микрорайон', 'аллея', 'линия',
+}
+LOCALITY_WORDS = {'город', 'поселок', 'область', 'район', 'россия'}
+HOUSE_RE = re.compile(r'\d+[а-я]?')
+HOUSE_PARTS = {'корпус', 'строение'}
+
+
+def split_address(canonical_address):
+    '''
+    Street tokens and house of a canonical address:
+    «улица ленина 5 корпус 2 квартира 7» becomes (['улица', 'ленина'], '5 корпус 2').
+    '''
+    tokens = canonical_address.split()
+    for index, token in enumerate(tokens):
+        if index and HOUSE_RE.fullmatch(token):
+            break
+    else:
+        return tokens, ''
+
+    house = [tokens[index]]
+    rest = tokens[index + 1:]
+    while len(rest) >= 2 and rest[0] in HOUSE_PARTS and rest[1].isdigit():
+        house.extend(rest[:2])
+        rest = rest[2:]
+    return tokens[:index], ' '.join(house)
+
+
+def get_trigrams(name):
+    trigrams = set()
+    for word in name.split():
+        padded = f'  {word} '
+        trigrams.update(padded[index:index + 3] for index in range(len(padded) - 2))
+    return trigrams
+
+
+class Gazetteer:
+    '''
+    In-memory street and house directory. Street names are matched exactly or, with typos
+    and missing words, by trigram similarity; houses are matched exactly, then by the plain number.
+    '''
+
+    def __init__(self, rows, min_similarity=0.4):
+        self.min_similarity = min_similarity
+        self.streets = []
+        self.houses = []
+        self.streets_by_name = defaultdict(list)
+        self.trigram_index = defaultdict(list)
+
+        streets_ids = {}
+        for street, house, latitude, longitude in rows:
+            street_type, name = self.parse_street(normalize_address(street).split())
+            if not name:
+                continue
+            street_id = streets_ids.get((name, street_type))
+            if street_id is None:
+                street_id = streets_ids[(name, street_type)] = len(self.streets)
+                self.streets.append((name, street_type))
+                self.houses.append({})
+                self.streets_by_name[name].append(street_id)
+            self.houses[street_id][normalize_address(house)] = (latitude.strip(), longitude.strip())
+
+        self.trigrams_count = {}
+        for name in self.streets_by_name:
+            trigrams = get_trigrams(name)
+            self.trigrams_count[name] = len(trigrams)
+            for trigram in trigrams:
+                self.trigram_index[trigram].append(name)
+
+    def __len__(self):
+        return sum(len(houses) for houses in self.houses)
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        '''
+        CSV with street, house, latitude and longitude columns.
+        '''
+        with open(path, encoding='utf-8', newline='') as file:
+            rows = [
+                (row['street'], row['house'], row['latitude'], row['longitude'])
+                for row in csv.DictReader(file)
+                if row.get('street') and row.get('house')
+            ]
+        return cls(rows, **kwargs)
+
+    @staticmethod
+    def parse_street(tokens):
+        street_types = [token for token in tokens if token in STREET_TYPES]
+        name = ' '.join(token for token in tokens if token not in STREET_TYPES and token not in LOCALITY_WORDS)
+        return (street_types[-1] if street_types else ''), name
+
+    def find_streets(self, name):
+        '''
+        Ids of streets called `name`. A city or district written before the street
+        is skipped by trying shorter endings of the name.
+        '''
+        words = name.split()
+        for start in range(len(words)):
+            street_ids = self.streets_by_name.get(' '.join(words[start:]))
+            if street_ids:
+                return street_ids
+
+        best_name, best_similarity = None, 0
+        for start in range(len(words)):
+            candidate = ' '.join(words[start:])
+            trigrams = get_trigrams(candidate)
+            shared = Counter(
+                street_name for trigram in trigrams for street_name in self.trigram_index.get(trigram, ())
+            )
+            for street_name, shared_count in shared.items():
+                similarity = shared_count / (len(trigrams) + self.trigrams_count[street_name] - shared_count)
+                if similarity > best_similarity:
+                    best_name, best_similarity = street_name, similarity
+        if best_similarity < self.min_similarity:
+            return []
+        return self.streets_by_name[best_name]
+
+    def geocode(self, address):
+        '''
+        Returns (latitude, longitude) or None if the address is not in the directory
+        or matches streets of different types equally well.
+        '''
+        street_tokens, house = split_address(normalize_address(address))
+        street_type, name = self.parse_street(street_tokens)
+        if not name or not house:
+            return
+
+        street_ids = self.find_streets(name)
+        if street_type:
+            same_type_ids = [street_id for street_id in street_ids if self.streets[street_id][1] == street_type]
+            street_ids = same_type_ids or street_ids
+
+        house_number = house.split()[0]
+        for house_key in (house, house_number, re.sub(r'\D', '', house_number)):
+            found = [
+                self.houses[street_id][house_key] for street_id in street_ids if house_key in self.houses[street_id]
+            ]
+            if len(found) == 1:
+                return found[0]
+            if found:
+                return
+
+
+_gazetteer = None
+_gazetteer_lock = threading.Lock()
+
+
+def get_gazetteer():
+    '''
+    The directory is loaded from GAZETTEER_PATH on first use. Returns None when it is not configured.
+    '''
+    global _gazetteer
+    if not settings.GAZETTEER_PATH:
+        return
+    with _gazetteer_lock:
+        if _gazetteer is None:
+            _gazetteer = Gazetteer.from_file(settings.GAZETTEER_PATH, min_similarity=settings.GAZETTEER_MIN_SIMILARITY)
+        return _gazetteer
+
+
+@receiver(setting_changed)
+def reset_gazetteer(setting, **kwargs):
+    global _gazetteer
+    if setting in {'GAZETTEER_PATH', 'GAZETTEER_MIN_SIMILARITY'}:
+        with _gazetteer_lock:
+            _gazetteer = None
@@ -1,64 +1,403 @@
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError, as_completed
+from datetime import timedelta
+from decimal import Decimal
+
 import requests
-from environs import Env
-from geopy import distance
+from django.conf import settings
+from django.utils import timezone
+
+from .addresses import normalize_address
+from .gazetteer import get_gazetteer
+from .geocoder import GeocoderUnavailable, get_geocoder
+from .jobs import enqueue, get_pending_keys
+from .models import GeocoderFailure, Order, Place, RestaurantDistance
+
 
-from .models import Place
+class CoordinatesCache:
+    '''
+    Bounded LRU cache of address coordinates in front of the Place table.
+    Entries expire after `ttl` seconds so changes made by other processes are picked up.
+    Addresses the geocoder failed on are cached as None.
+    '''
 
-env = Env()
-env.read_env()
-API_KEY = env.str('YANDEX_API_KEY')
+    MISSING = object()
 
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
 
-def save_coordinates_to_db(address, latitude, longitude):
-    Place.objects.get_or_create(
-        address=address,
-        latitude=latitude,
-        longitude=longitude,
-    )
+    def get(self, address):
+        with self._lock:
+            item = self._items.get(address)
+            if item is None or item[1] < time.monotonic():
+                self._items.pop(address, None)
+                self.misses += 1
+                return self.MISSING
+            self._items.move_to_end(address)
+            self.hits += 1
+            return item[0]
+
+    def set(self, address, coordinates, ttl=None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        with self._lock:
+            self._items[address] = (coordinates, time.monotonic() + ttl)
+            self._items.move_to_end(address)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def delete(self, address):
+        with self._lock:
+            self._items.pop(address, None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def get_stats(self):
+        with self._lock:
+            requests_count = self.hits + self.misses
+            return {
+                'size': len(self._items),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / requests_count, 4) if requests_count else None,
+            }
+
+
+coordinates_cache = CoordinatesCache(settings.GEOCODER_CACHE_SIZE, settings.GEOCODER_CACHE_TTL)
 
 
-def geocoding(address, apikey=API_KEY):
+def is_geocoder_available():
+    return get_geocoder().is_available
+
+
+def save_many_coordinates_to_db(coordinates):
+    places = [
+        Place(
+            address=address,
+            canonical_address=normalize_address(address),
+            latitude=latitude,
+            longitude=longitude,
+        )
+        for address, (latitude, longitude) in coordinates.items()
+    ]
+    Place.objects.bulk_create(places, ignore_conflicts=True)
+    GeocoderFailure.objects.filter(address__in=[place.canonical_address for place in places]).delete()
+    for place in places:
+        coordinates_cache.set(place.canonical_address, (place.latitude, place.longitude))
+
+
+def save_geocoder_failures(addresses, reason):
     '''
-    Geocoder response structure:
-    https://yandex.ru/dev/maps/geocoder/doc/desc/reference/response_structure.html#response_structure__json_response
+    Remember addresses the geocoder could not resolve, so they are not requested again
+    until GEOCODER_NOT_FOUND_TTL or GEOCODER_ERROR_TTL expires.
     '''
+    canonical_addresses = {normalize_address(address) for address in addresses}
+    if not canonical_addresses:
+        return
+
+    ttl = settings.GEOCODER_NOT_FOUND_TTL if reason == 'NOT_FOUND' else settings.GEOCODER_ERROR_TTL
+    failed_at = timezone.now()
+    GeocoderFailure.objects.filter(address__in=canonical_addresses).delete()
+    GeocoderFailure.objects.bulk_create([
+        GeocoderFailure(
+            address=address, reason=reason, failed_at=failed_at, expires_at=failed_at + timedelta(seconds=ttl)
+        )
+        for address in canonical_addresses
+    ])
+    for address in canonical_addresses:
+        coordinates_cache.set(address, None, ttl=ttl)
+
+
+def geocode_offline(addresses):
+    '''
+    Resolve addresses with the local gazetteer, found ones are saved as places.
+    '''
+    gazetteer = get_gazetteer()
+    if gazetteer is None:
+        return {}
+
+    located = {}
+    for address in addresses:
+        coordinates = gazetteer.geocode(address)
+        if coordinates:
+            located[address] = coordinates
+    if located:
+        save_many_coordinates_to_db(located)
+    return located
 
-    base_url = 'https://geocode-maps.yandex.ru/1.x'
-    params = {'geocode': address, 'apikey': apikey, 'format': 'json'}
+
+def request_many_coordinates(addresses, timeout):
+    '''
+    Request addresses concurrently, waiting no longer than `timeout` seconds for the whole batch.
+    Returns found coordinates (None if the geocoder does not know an address) and addresses that failed.
+    Addresses that did not make it in time or were rejected by the open circuit breaker are in neither.
+    '''
+    if not is_geocoder_available():
+        return {}, []
+
+    deadline = time.monotonic() + timeout
+    executor = ThreadPoolExecutor(max_workers=min(settings.GEOCODER_THREADS, len(addresses)))
+    geocoder = get_geocoder()
+    futures = {
+        executor.submit(geocoder.request_coordinates, address, timeout=timeout): address
+        for address in addresses
+    }
+
+    geocoded = {}
+    failed_addresses = []
     try:
-        response = requests.get(base_url, params=params)
-        response.raise_for_status()
-        response_data = response.json()['response']['GeoObjectCollection']
-    except requests.exceptions.RequestException:
-        return
+        for future in as_completed(futures, timeout=max(deadline - time.monotonic(), 0)):
+            try:
+                geocoded[futures[future]] = future.result()
+            except GeocoderUnavailable:
+                continue
+            except requests.exceptions.RequestException:
+                failed_addresses.append(futures[future])
+    except TimeoutError:
+        pass
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
 
-    if response_data['metaDataProperty']['GeocoderResponseMetaData']['found'] == '0':
-        return
+    return geocoded, failed_addresses
+
+
+def geocode_many(addresses, timeout=None):
+    '''
+    Resolve addresses concurrently, addresses with the same canonical form are requested once.
+    Returns coordinates or None for addresses the geocoder does not know.
+    Addresses that failed or did not make it in time are missing from the result.
+    '''
+    if timeout is None:
+        timeout = settings.GEOCODER_BATCH_TIMEOUT
+    canonical_addresses = {address: normalize_address(address) for address in addresses if address}
+    if not canonical_addresses:
+        return {}
+    addresses = set({key: address for address, key in canonical_addresses.items()}.values())
+
+    geocoded, failed_addresses = request_many_coordinates(addresses, timeout)
+
+    save_many_coordinates_to_db({address: coordinates for address, coordinates in geocoded.items() if coordinates})
+    save_geocoder_failures([address for address, coordinates in geocoded.items() if not coordinates], 'NOT_FOUND')
+    save_geocoder_failures(failed_addresses, 'ERROR')
+
+    geocoded_by_key = {canonical_addresses[address]: coordinates for address, coordinates in geocoded.items()}
+    return {
+        address: geocoded_by_key[key]
+        for address, key in canonical_addresses.items() if key in geocoded_by_key
+    }
+
+
+COORDINATE_PRECISION = Decimal('0.000001')
+
+
+def refresh_places(places, timeout=None):
+    '''
+    Geocode places again and update their coordinates. A place the geocoder no longer finds
+    keeps its old coordinates. Candidate restaurants of open orders at moved places are queued
+    to be refreshed. Returns ids of places that were checked.
+    '''
+    # candidates imports this module to read and save distances.
+    from .candidates import enqueue_candidates_refresh
+
+    if timeout is None:
+        timeout = settings.GEOCODER_BATCH_TIMEOUT
+    places = list(places)
+    if not places:
+        return set()
+
+    geocoded, _ = request_many_coordinates({place.address for place in places}, timeout)
 
-    places_found = response_data['featureMember']
-    most_relevant = places_found[0]
-    lon, lat = most_relevant['GeoObject']['Point']['pos'].split(' ')
+    refreshed_places = []
+    moved_places = []
+    for place in places:
+        if place.address not in geocoded:
+            continue
+        if geocoded[place.address]:
+            latitude, longitude = (Decimal(value).quantize(COORDINATE_PRECISION) for value in geocoded[place.address])
+            if (latitude, longitude) != (place.latitude, place.longitude):
+                place.latitude, place.longitude = latitude, longitude
+                moved_places.append(place)
+            coordinates_cache.set(place.canonical_address, (place.latitude, place.longitude))
+        place.request_to_geocoder_at = timezone.now()
+        refreshed_places.append(place)
 
-    save_coordinates_to_db(address, lat, lon)
+    Place.objects.bulk_update(refreshed_places, ['latitude', 'longitude', 'request_to_geocoder_at'])
+    forget_distances(moved_places)
+    enqueue_candidates_refresh(places_ids=[place.id for place in moved_places])
+    return {place.id for place in refreshed_places}
 
-    return lat, lon
+
+def enqueue_places_refresh(places):
+    enqueue('refresh_place', {place.canonical_address: {'place_id': place.id} for place in places})
+
+
+def enqueue_stale_places_refresh(places):
+    stale_before = timezone.now() - timedelta(days=settings.PLACE_MAX_AGE_DAYS)
+    enqueue_places_refresh([place for place in places if place.request_to_geocoder_at < stale_before])
+
+
+def enqueue_geocoding(addresses):
+    '''
+    Returns addresses waiting for the geocoder.
+    '''
+    pending_keys = enqueue('geocode', {normalize_address(address): {'address': address} for address in addresses})
+    return {address for address in addresses if normalize_address(address) in pending_keys}
+
+
+def enqueue_restaurants_geocoding(restaurants):
+    '''
+    Returns ids of restaurants waiting for the geocoder.
+    '''
+    pending_keys = enqueue('geocode_restaurant', {
+        str(restaurant.id): {'restaurant_id': restaurant.id} for restaurant in restaurants
+    })
+    return {int(key) for key in pending_keys}
+
+
+def get_pending_restaurants_ids(restaurants):
+    pending_keys = get_pending_keys('geocode_restaurant', [str(restaurant.id) for restaurant in restaurants])
+    return {int(key) for key in pending_keys}
 
 
 def get_coordinates(address):
-    try:
-        place = Place.objects.get(address=address)
-        return (place.latitude, place.longitude)
-    except Place.DoesNotExist:
-        return geocoding(address)
+    return get_coordinates_many([address]).get(address)
 
 
-def calculate_distance(restaurant_address, client_address):
-    restaurant_coordinates = get_coordinates(restaurant_address)
-    if not restaurant_coordinates:
-        return
+def get_coordinates_many(addresses):
+    '''
+    Coordinates of addresses from the cache, Place table or local gazetteer,
+    None for addresses the geocoder recently failed on. Unknown addresses are left out:
+    they are geocoded in background, see enqueue_geocoding().
+    Addresses are matched by their canonical form.
 
-    client_coordinates = get_coordinates(client_address)
-    if not client_coordinates:
-        return
+    Places older than PLACE_MAX_AGE_DAYS are still returned, but queued to be geocoded again in background.
+    '''
+    canonical_addresses = {address: normalize_address(address) for address in addresses if address}
+    keys = set(canonical_addresses.values())
+
+    coordinates = {}
+    for key in keys:
+        cached_coordinates = coordinates_cache.get(key)
+        if cached_coordinates is not coordinates_cache.MISSING:
+            coordinates[key] = cached_coordinates
+
+    not_cached_keys = keys - coordinates.keys()
+    if not_cached_keys:
+        places = (
+            Place.objects
+            .filter(canonical_address__in=not_cached_keys)
+            .only('id', 'canonical_address', 'latitude', 'longitude', 'request_to_geocoder_at')
+        )
+        for place in places:
+            coordinates[place.canonical_address] = (place.latitude, place.longitude)
+            coordinates_cache.set(place.canonical_address, coordinates[place.canonical_address])
+        enqueue_stale_places_refresh(places)
+
+    not_found_keys = keys - coordinates.keys()
+    if not_found_keys:
+        located = geocode_offline(
+            address for address, key in canonical_addresses.items() if key in not_found_keys
+        )
+        for address, address_coordinates in located.items():
+            coordinates[canonical_addresses[address]] = address_coordinates
+
+    not_found_keys = keys - coordinates.keys()
+    if not_found_keys:
+        now = timezone.now()
+        failures = (
+            GeocoderFailure.objects
+            .filter(address__in=not_found_keys, expires_at__gt=now)
+            .values_list('address', 'expires_at')
+        )
+        for key, expires_at in failures:
+            coordinates[key] = None
+            coordinates_cache.set(key, None, ttl=(expires_at - now).total_seconds())
+
+    return {
+        address: coordinates[key]
+        for address, key in canonical_addresses.items() if key in coordinates
+    }
+
+
+def link_orders_to_places(orders):
+    '''
+    Set `place` of orders whose address is already geocoded. Returns linked orders.
+    '''
+    orders = [order for order in orders if order.address]
+    if not orders:
+        return []
+
+    canonical_addresses = {order.address: normalize_address(order.address) for order in orders}
+    places = {
+        place.canonical_address: place
+        for place in Place.objects.filter(canonical_address__in=set(canonical_addresses.values())).order_by('id')
+    }
+    located = geocode_offline(
+        address for address, key in canonical_addresses.items() if key not in places
+    )
+    if located:
+        located_keys = {canonical_addresses[address] for address in located}
+        located_places = Place.objects.filter(canonical_address__in=located_keys)
+        places.update((place.canonical_address, place) for place in located_places)
+
+    linked_orders = []
+    for order in orders:
+        place = places.get(canonical_addresses[order.address])
+        if place:
+            order.place = place
+            linked_orders.append(order)
+    Order.objects.bulk_update(linked_orders, ['place'], batch_size=500)
+    return linked_orders
+
+
+def get_cached_distances(places_ids):
+    '''
+    Distances from restaurants to places saved earlier: {place id: {restaurant id: km}}.
+    '''
+    distances = defaultdict(dict)
+    places_ids = set(places_ids)
+    if not places_ids:
+        return distances
+
+    saved_distances = (
+        RestaurantDistance.objects
+        .filter(place_id__in=places_ids)
+        .values_list('place_id', 'restaurant_id', 'distance')
+    )
+    for place_id, restaurant_id, restaurant_distance in saved_distances:
+        distances[place_id][restaurant_id] = float(restaurant_distance)
+    return distances
+
+
+def save_distances(distances):
+    '''
+    Save calculated distances given as {place id: {restaurant id: km}}.
+    '''
+    RestaurantDistance.objects.bulk_create(
+        [
+            RestaurantDistance(place_id=place_id, restaurant_id=restaurant_id, distance=restaurant_distance)
+            for place_id, restaurants_distances in distances.items()
+            for restaurant_id, restaurant_distance in restaurants_distances.items()
+            if restaurant_distance is not None
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def forget_distances(places):
+    '''
+    Drop saved distances from restaurants to `places` whose coordinates changed.
+    '''
+    RestaurantDistance.objects.filter(place__in=places).delete()
 
-    return round(distance.distance(restaurant_coordinates, client_coordinates).km, 2)
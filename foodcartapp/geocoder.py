@@ -0,0 +1,289 @@
+import hashlib
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from requests.adapters import HTTPAdapter
+
+
+class GeocoderUnavailable(requests.exceptions.RequestException):
+    pass
+
+
+class CircuitBreaker:
+    '''
+    Opens after `failure_threshold` consecutive failures and rejects requests for `reset_timeout` seconds.
+    After that the circuit is half-open: only the caller that takes the probe lock is let through,
+    success closes the circuit, failure opens it again. A probe that never reports back
+    releases the lock after `reset_timeout` seconds.
+
+    The state lives in the Django cache, which web and worker processes share (settings.CACHES),
+    so the site knows when the geocoder failed in the worker.
+    '''
+
+    def __init__(self, name, failure_threshold, reset_timeout):
+        self.failures_key = f'circuit-breaker:{name}:failures'
+        self.opened_until_key = f'circuit-breaker:{name}:opened-until'
+        self.probe_key = f'circuit-breaker:{name}:probe'
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+    @property
+    def is_open(self):
+        opened_until = cache.get(self.opened_until_key)
+        return opened_until is not None and opened_until > time.time()
+
+    def allow_request(self):
+        opened_until = cache.get(self.opened_until_key)
+        if opened_until is None:
+            return True
+        if opened_until > time.time():
+            return False
+        return cache.add(self.probe_key, True, timeout=self.reset_timeout)
+
+    def record_success(self):
+        cache.delete_many([self.failures_key, self.opened_until_key, self.probe_key])
+
+    def record_failure(self):
+        cache.add(self.failures_key, 0, timeout=None)
+        try:
+            failures = cache.incr(self.failures_key)
+        except ValueError:
+            failures = 1
+            cache.set(self.failures_key, failures, timeout=None)
+
+        if failures >= self.failure_threshold:
+            cache.set(self.opened_until_key, time.time() + self.reset_timeout, timeout=None)
+            cache.set(self.failures_key, self.failure_threshold - 1, timeout=None)
+            cache.delete(self.probe_key)
+
+    def reset(self):
+        cache.delete_many([self.failures_key, self.opened_until_key, self.probe_key])
+
+
+class GeocoderBackend:
+    '''
+    Subclasses implement `geocode()`: return (latitude, longitude), None for an unknown address,
+    or raise requests.exceptions.RequestException if the geocoder failed.
+    '''
+
+    def __init__(self, name=None, failure_threshold=None, reset_timeout=None):
+        self.name = name or type(self).__name__
+        self.circuit_breaker = CircuitBreaker(
+            self.name,
+            failure_threshold or settings.GEOCODER_FAILURE_THRESHOLD,
+            reset_timeout or settings.GEOCODER_CIRCUIT_RESET_TIMEOUT,
+        )
+
+    @property
+    def is_available(self):
+        return not self.circuit_breaker.is_open
+
+    def request_coordinates(self, address, timeout=None):
+        if not self.is_available or not self.circuit_breaker.allow_request():
+            raise GeocoderUnavailable(f'{self.name} временно отключён после серии ошибок')
+
+        try:
+            coordinates = self.geocode(address, timeout)
+        except requests.exceptions.RequestException:
+            self.circuit_breaker.record_failure()
+            raise
+        self.circuit_breaker.record_success()
+        return coordinates
+
+    def geocode(self, address, timeout=None):
+        raise NotImplementedError
+
+
+class YandexGeocoder(GeocoderBackend):
+
+    base_url = 'https://geocode-maps.yandex.ru/1.x'
+
+    def __init__(self, apikey=None, connect_timeout=None, read_timeout=None, pool_size=None, **kwargs):
+        super().__init__(**kwargs)
+        self.apikey = apikey or settings.YANDEX_API_KEY
+        self.timeout = (
+            connect_timeout or settings.GEOCODER_CONNECT_TIMEOUT,
+            read_timeout or settings.GEOCODER_READ_TIMEOUT,
+        )
+        self.session = requests.Session()
+        self.session.mount('https://', HTTPAdapter(pool_maxsize=pool_size or settings.GEOCODER_THREADS))
+
+    @property
+    def is_available(self):
+        return bool(self.apikey) and super().is_available
+
+    def geocode(self, address, timeout=None):
+        '''
+        Geocoder response structure:
+        https://yandex.ru/dev/maps/geocoder/doc/desc/reference/response_structure.html#response_structure__json_response
+        '''
+        timeouts = self.timeout
+        if timeout is not None:
+            timeouts = tuple(min(limit, timeout) for limit in self.timeout)
+        params = {'geocode': address, 'apikey': self.apikey, 'format': 'json'}
+        response = self.session.get(self.base_url, params=params, timeout=timeouts)
+        response.raise_for_status()
+        try:
+            response_data = response.json()['response']['GeoObjectCollection']
+            if response_data['metaDataProperty']['GeocoderResponseMetaData']['found'] == '0':
+                return
+
+            places_found = response_data['featureMember']
+            most_relevant = places_found[0]
+            lon, lat = most_relevant['GeoObject']['Point']['pos'].split(' ')
+        except (ValueError, KeyError, IndexError, TypeError, AttributeError) as error:
+            raise requests.exceptions.RequestException(f'Неожиданный ответ геокодера: {error}') from error
+
+        return lat, lon
+
+
+class FakeGeocoder(GeocoderBackend):
+    '''
+    Offline geocoder for development and benchmarks. Every address gets stable coordinates
+    inside `bounds` after `latency` ± `latency_jitter` seconds, `slow_rate` of requests take
+    `slow_latency` instead, `error_rate` of requests fail and `not_found_rate` of addresses are unknown.
+    '''
+
+    def __init__(self, latency=0.05, latency_jitter=0, slow_rate=0, slow_latency=1, error_rate=0,
+                 not_found_rate=0, bounds=((55.55, 37.35), (55.95, 37.85)), seed=None, **kwargs):
+        super().__init__(**kwargs)
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.error_rate = error_rate
+        self.not_found_rate = not_found_rate
+        self.bounds = bounds
+        self.random = random.Random(seed)
+        self.random_lock = threading.Lock()
+
+    def geocode(self, address, timeout=None):
+        with self.random_lock:
+            latency = max(self.latency + self.random.uniform(-self.latency_jitter, self.latency_jitter), 0)
+            if self.random.random() < self.slow_rate:
+                latency = self.slow_latency
+            failed = self.random.random() < self.error_rate
+
+        if timeout is not None and latency > timeout:
+            time.sleep(timeout)
+            raise requests.exceptions.Timeout(f'{self.name} не ответил за {timeout} с')
+        time.sleep(latency)
+        if failed:
+            raise requests.exceptions.ConnectionError(f'{self.name}: имитация ошибки')
+
+        digest = hashlib.sha256(address.encode()).digest()
+        if int.from_bytes(digest[:2], 'big') / 0xFFFF < self.not_found_rate:
+            return
+
+        (min_latitude, min_longitude), (max_latitude, max_longitude) = self.bounds
+        latitude = min_latitude + (max_latitude - min_latitude) * int.from_bytes(digest[2:6], 'big') / 0xFFFFFFFF
+        longitude = min_longitude + (max_longitude - min_longitude) * int.from_bytes(digest[6:10], 'big') / 0xFFFFFFFF
+        return f'{latitude:.6f}', f'{longitude:.6f}'
+
+
+class HedgedGeocoder(GeocoderBackend):
+    '''
+    Sends the request to the first backend and, if it has not answered within the `percentile`
+    of its recent latencies, a second request to the next one. The first successful answer wins.
+    '''
+
+    executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix='hedged-geocoder')
+
+    def __init__(self, backends, percentile=95, window=200, initial_delay=0.5, min_delay=0.01, **kwargs):
+        super().__init__(**kwargs)
+        if len(backends) < 2:
+            raise ImproperlyConfigured('HedgedGeocoder needs at least two backends')
+        self.backends = [build_geocoder(backend) for backend in backends]
+        self.percentile = percentile
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.latencies = deque(maxlen=window)
+        self.latencies_lock = threading.Lock()
+
+    @property
+    def is_available(self):
+        return any(backend.is_available for backend in self.backends)
+
+    @property
+    def hedge_delay(self):
+        with self.latencies_lock:
+            latencies = sorted(self.latencies)
+        if len(latencies) < 10:
+            return self.initial_delay
+        index = min(int(len(latencies) * self.percentile / 100), len(latencies) - 1)
+        return max(latencies[index], self.min_delay)
+
+    def request_primary(self, backend, address, timeout):
+        started_at = time.monotonic()
+        coordinates = backend.request_coordinates(address, timeout)
+        with self.latencies_lock:
+            self.latencies.append(time.monotonic() - started_at)
+        return coordinates
+
+    def geocode(self, address, timeout=None):
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        backends = [backend for backend in self.backends if backend.is_available]
+        if not backends:
+            raise GeocoderUnavailable(f'{self.name}: все геокодеры недоступны')
+
+        primary, *reserve = backends
+        running = {self.executor.submit(self.request_primary, primary, address, timeout)}
+        hedge_delay = self.hedge_delay if timeout is None else min(self.hedge_delay, timeout)
+        done, _ = wait(running, timeout=hedge_delay)
+
+        last_error = None
+        while True:
+            for future in done:
+                running.discard(future)
+                try:
+                    return future.result()
+                except requests.exceptions.RequestException as error:
+                    last_error = error
+
+            remaining = deadline - time.monotonic() if deadline is not None else None
+            if remaining is not None and remaining <= 0:
+                raise requests.exceptions.Timeout(f'{self.name} не ответил за {timeout} с')
+            if reserve:
+                running.add(self.executor.submit(reserve.pop(0).request_coordinates, address, remaining))
+            elif not running:
+                raise last_error
+
+            done, _ = wait(running, timeout=remaining, return_when=FIRST_COMPLETED)
+
+
+def build_geocoder(config):
+    '''
+    `config` is a dict with the BACKEND dotted path and OPTIONS passed to its constructor.
+    '''
+    backend_class = import_string(config['BACKEND'])
+    return backend_class(**config.get('OPTIONS', {}))
+
+
+_geocoder = None
+_geocoder_lock = threading.Lock()
+
+
+def get_geocoder():
+    global _geocoder
+    with _geocoder_lock:
+        if _geocoder is None:
+            _geocoder = build_geocoder(settings.GEOCODER)
+        return _geocoder
+
+
+@receiver(setting_changed)
+def reset_geocoder(setting, **kwargs):
+    global _geocoder
+    if setting == 'GEOCODER':
+        with _geocoder_lock:
+            _geocoder = None
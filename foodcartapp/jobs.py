@@ -0,0 +1,149 @@
+import logging
+import traceback
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+PENDING_STATUSES = ['NEW', 'IN_PROGRESS']
+
+handlers = {}
+batch_handlers = set()
+
+
+def job_handler(name, batch=False):
+    '''
+    A batch handler gets payloads of all jobs claimed together and returns
+    a list of errors, None for every payload processed successfully.
+    '''
+    def register(handler):
+        handlers[name] = handler
+        if batch:
+            batch_handlers.add(name)
+        return handler
+    return register
+
+
+def enqueue(name, payloads, coalesce_running=True):
+    '''
+    Put jobs for `payloads` (a mapping of job key to payload) into the queue.
+    Keys that already have a pending job are not enqueued twice. With `coalesce_running=False`
+    only jobs still waiting in the queue count: a running job may have read the data before the change.
+    Returns keys that are waiting for the worker.
+    '''
+    if not payloads:
+        return set()
+
+    statuses = PENDING_STATUSES if coalesce_running else ['NEW']
+    pending_keys = get_pending_keys(name, payloads.keys(), statuses)
+
+    Job.objects.bulk_create([
+        Job(name=name, key=key, payload=payload)
+        for key, payload in payloads.items() if key not in pending_keys
+    ])
+
+    return set(payloads.keys())
+
+
+def get_pending_keys(name, keys, statuses=PENDING_STATUSES):
+    keys = set(keys)
+    if not keys:
+        return set()
+    return set(
+        Job.objects
+        .filter(name=name, key__in=keys, status__in=statuses)
+        .values_list('key', flat=True)
+    )
+
+
+def claim_jobs(limit):
+    '''
+    Jobs stuck in progress longer than JOBS_LEASE_TIME are claimed again,
+    so a crashed worker does not lose them.
+    '''
+    now = timezone.now()
+    candidates = (
+        Job.objects
+        .filter(status__in=PENDING_STATUSES, run_after__lte=now)
+        .order_by('run_after')
+        .values_list('id', 'run_after')[:limit]
+    )
+
+    claimed_ids = []
+    lease_until = now + timedelta(seconds=settings.JOBS_LEASE_TIME)
+    for job_id, run_after in candidates:
+        claimed = (
+            Job.objects
+            .filter(id=job_id, status__in=PENDING_STATUSES, run_after=run_after)
+            .update(status='IN_PROGRESS', run_after=lease_until)
+        )
+        if claimed:
+            claimed_ids.append(job_id)
+
+    return list(Job.objects.filter(id__in=claimed_ids).order_by('id'))
+
+
+def run_jobs(jobs):
+    jobs_by_name = defaultdict(list)
+    for job in jobs:
+        jobs_by_name[job.name].append(job)
+
+    for name, named_jobs in jobs_by_name.items():
+        if name not in batch_handlers:
+            for job in named_jobs:
+                yield job, run_job(job)
+            continue
+
+        try:
+            errors = handlers[name]([job.payload for job in named_jobs])
+        except Exception:
+            logger.exception('Jobs %s failed', name)
+            errors = [traceback.format_exc()] * len(named_jobs)
+        for job, error in zip(named_jobs, errors):
+            yield job, finish_job(job, error)
+
+
+def run_job(job):
+    handler = handlers.get(job.name)
+    try:
+        if handler is None:
+            raise LookupError(f'Unknown job: {job.name}')
+        handler(job.payload)
+    except Exception:
+        logger.exception('Job %s failed', job)
+        return finish_job(job, traceback.format_exc())
+
+    return finish_job(job)
+
+
+def finish_job(job, error=None):
+    job.attempts += 1
+    if error is None:
+        job.status = 'DONE'
+        job.finished_at = timezone.now()
+    elif job.attempts >= settings.JOBS_MAX_ATTEMPTS:
+        job.last_error = error
+        job.status = 'FAILED'
+        job.finished_at = timezone.now()
+    else:
+        job.last_error = error
+        job.status = 'NEW'
+        backoff = settings.JOBS_RETRY_DELAY * 2 ** (job.attempts - 1)
+        job.run_after = timezone.now() + timedelta(seconds=backoff)
+
+    job.save(update_fields=['status', 'attempts', 'run_after', 'last_error', 'finished_at'])
+    return job.status == 'DONE'
+
+
+def purge_done_jobs(older_than):
+    '''
+    Delete jobs done more than `older_than` (a timedelta) ago. Failed jobs are kept for inspection.
+    Returns the number of deleted jobs.
+    '''
+    deleted, _ = Job.objects.filter(status='DONE', finished_at__lt=timezone.now() - older_than).delete()
+    return deleted
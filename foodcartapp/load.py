@@ -0,0 +1,79 @@
+import logging
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+
+from .models import Order
+
+logger = logging.getLogger(__name__)
+
+
+def is_open(status, restaurant_id):
+    return status == 'NEW' and restaurant_id is not None
+
+
+class LoadCounters:
+    '''
+    Open orders per restaurant kept in process memory. Counters change when this process assigns
+    orders or changes their status, and are recounted from the database every LOAD_RECONCILE_INTERVAL
+    seconds to pick up changes made by other processes.
+    '''
+
+    def __init__(self):
+        self.counts = Counter()
+        self.reconciled_at = None
+        self.lock = threading.Lock()
+
+    def get(self):
+        with self.lock:
+            counts_age = time.monotonic() - (self.reconciled_at or 0)
+            if self.reconciled_at is None or counts_age >= settings.LOAD_RECONCILE_INTERVAL:
+                self._reconcile()
+            return dict(self.counts)
+
+    def reconcile(self):
+        with self.lock:
+            self._reconcile()
+
+    def _reconcile(self):
+        counts = Counter(dict(
+            Order.objects
+            .filter(status='NEW')
+            .exclude(restaurant=None)
+            .values_list('restaurant')
+            .annotate(orders_count=Count('id'))
+        ))
+        if self.reconciled_at is not None and counts != self.counts:
+            logger.info('Restaurants load drifted from the database and was recounted')
+        self.counts = counts
+        self.reconciled_at = time.monotonic()
+
+    def add(self, restaurant_id, delta):
+        '''
+        Applied once the current transaction commits, so rolled back orders are not counted.
+        '''
+        def apply():
+            with self.lock:
+                self.counts[restaurant_id] += delta
+                if self.counts[restaurant_id] <= 0:
+                    del self.counts[restaurant_id]
+
+        transaction.on_commit(apply)
+
+    def track(self, previous, current):
+        '''
+        Update counters for an order that moved from `previous` to `current` (status, restaurant id) state.
+        '''
+        if previous == current:
+            return
+        if previous and is_open(*previous):
+            self.add(previous[1], -1)
+        if current and is_open(*current):
+            self.add(current[1], 1)
+
+
+load_counters = LoadCounters()
@@ -0,0 +1,52 @@
+import random
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from geopy import distance
+
+from foodcartapp.distances import distance_matrix
+
+MOSCOW_CENTER = (55.751244, 37.618423)
+
+
+def random_points(count, spread):
+    return [
+        (MOSCOW_CENTER[0] + random.uniform(-spread, spread), MOSCOW_CENTER[1] + random.uniform(-spread, spread))
+        for _ in range(count)
+    ]
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает скорость расчёта расстояний между заказами и ресторанами'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=300)
+        parser.add_argument('--restaurants', type=int, default=20)
+        parser.add_argument('--spread', type=float, default=0.3, help='Разброс точек в градусах')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        orders = random_points(options['orders'], options['spread'])
+        restaurants = random_points(options['restaurants'], options['spread'])
+        pairs_count = len(orders) * len(restaurants)
+
+        started_at = time.perf_counter()
+        exact = np.array([
+            [distance.distance(restaurant, order).km for restaurant in restaurants]
+            for order in orders
+        ])
+        per_pair_time = time.perf_counter() - started_at
+
+        started_at = time.perf_counter()
+        approximate = distance_matrix(orders, restaurants, exact=False)
+        matrix_time = time.perf_counter() - started_at
+
+        relative_error = np.abs(approximate - exact) / np.maximum(exact, 1e-9)
+
+        self.stdout.write(f'Пар заказ—ресторан: {pairs_count}')
+        self.stdout.write(f'geopy по парам: {per_pair_time:.4f} с, {pairs_count / per_pair_time:,.0f} пар/с')
+        self.stdout.write(f'Матрица numpy: {matrix_time:.4f} с, {pairs_count / matrix_time:,.0f} пар/с')
+        self.stdout.write(f'Ускорение: {per_pair_time / matrix_time:.0f}x')
+        self.stdout.write(f'Погрешность: макс. {relative_error.max():.3%}, макс. {np.abs(approximate - exact).max() * 1000:.0f} м')
@@ -0,0 +1,61 @@
+import json
+import time
+
+import numpy as np
+import requests
+from django.core.management.base import BaseCommand
+
+from foodcartapp.geocoder import build_geocoder
+
+SLOW_TAIL_BACKEND = {
+    'BACKEND': 'foodcartapp.geocoder.FakeGeocoder',
+    'OPTIONS': {
+        'latency': 0.02, 'latency_jitter': 0.005, 'slow_rate': 0.05, 'slow_latency': 0.3, 'error_rate': 0.01, 'seed': 1,
+    },
+}
+
+DEFAULT_CONFIGS = {
+    'один геокодер': SLOW_TAIL_BACKEND,
+    'хеджирование': {
+        'BACKEND': 'foodcartapp.geocoder.HedgedGeocoder',
+        'OPTIONS': {
+            'backends': [
+                {**SLOW_TAIL_BACKEND, 'OPTIONS': {**SLOW_TAIL_BACKEND['OPTIONS'], 'name': 'fake-primary'}},
+                {**SLOW_TAIL_BACKEND, 'OPTIONS': {**SLOW_TAIL_BACKEND['OPTIONS'], 'name': 'fake-reserve', 'seed': 2}},
+            ],
+            'percentile': 90,
+            'name': 'fake-hedged',
+        },
+    },
+}
+
+
+class Command(BaseCommand):
+    help = 'Измеряет задержки геокодера без обращения к сети (по умолчанию на FakeGeocoder)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--config', type=json.loads, help='JSON с BACKEND и OPTIONS, как в settings.GEOCODER')
+        parser.add_argument('--requests', type=int, default=300)
+
+    def handle(self, *args, **options):
+        configs = {'заданный геокодер': options['config']} if options['config'] else DEFAULT_CONFIGS
+        for title, config in configs.items():
+            geocoder = build_geocoder(config)
+            geocoder.circuit_breaker.reset()
+            for backend in getattr(geocoder, 'backends', []):
+                backend.circuit_breaker.reset()
+
+            latencies = []
+            errors_count = 0
+            for number in range(options['requests']):
+                started_at = time.perf_counter()
+                try:
+                    geocoder.request_coordinates(f'Тестовая улица, {number}', timeout=1)
+                except requests.exceptions.RequestException:
+                    errors_count += 1
+                latencies.append((time.perf_counter() - started_at) * 1000)
+
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+            self.stdout.write(
+                f'{title}: p50 {p50:.1f} мс, p95 {p95:.1f} мс, p99 {p99:.1f} мс, ошибок {errors_count}'
+            )
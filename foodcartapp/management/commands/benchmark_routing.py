@@ -0,0 +1,56 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from foodcartapp.distances import distance_matrix
+from foodcartapp.routing import nearest_insertion, plan_trips, route_length, split_tour, two_opt
+
+MOSCOW_CENTER = (55.751244, 37.618423)
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает рейсы курьеров «по одному заказу» и с группировкой и оптимизацией маршрута'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, nargs='+', default=[100, 300, 600])
+        parser.add_argument('--capacity', type=int, default=4)
+        parser.add_argument('--time-budget', type=float, default=1)
+        parser.add_argument('--spread', type=float, default=0.1, help='Разброс адресов в градусах')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        spread = options['spread']
+        for orders_count in options['orders']:
+            points = [
+                (MOSCOW_CENTER[0] + random.uniform(-spread, spread), MOSCOW_CENTER[1] + random.uniform(-spread, spread))
+                for _ in range(orders_count)
+            ]
+            matrix = distance_matrix([MOSCOW_CENTER, *points], [MOSCOW_CENTER, *points], exact=False)
+            one_per_order = 2 * matrix[0, 1:].sum()
+
+            started_at = time.perf_counter()
+            tour = nearest_insertion(matrix)
+            insertion_time = time.perf_counter() - started_at
+            insertion_only = sum(route_length(matrix, trip) for trip in split_tour(matrix, tour, options['capacity']))
+
+            started_at = time.perf_counter()
+            improved_tour = two_opt(matrix, tour)
+            two_opt_time = time.perf_counter() - started_at
+
+            started_at = time.perf_counter()
+            trips = plan_trips(MOSCOW_CENTER, points, options['capacity'], options['time_budget'])
+            planning_time = time.perf_counter() - started_at
+            planned = sum(trip_length for _, trip_length in trips)
+
+            self.stdout.write(self.style.MIGRATE_HEADING(f'Заказов: {orders_count}, рейсов: {len(trips)}'))
+            self.stdout.write(f'По заказу на рейс: {one_per_order:.0f} км')
+            self.stdout.write(f'Вставка ближайшего: {insertion_only:.0f} км, тур за {insertion_time * 1000:.0f} мс')
+            self.stdout.write(
+                f'Тур после 2-opt: {route_length(matrix, improved_tour):.0f} км вместо '
+                f'{route_length(matrix, tour):.0f} км, за {two_opt_time * 1000:.0f} мс'
+            )
+            self.stdout.write(
+                f'Полный план: {planned:.0f} км ({planned / one_per_order:.0%} пробега), за {planning_time * 1000:.0f} мс'
+            )
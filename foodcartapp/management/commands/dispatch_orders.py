@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from foodcartapp.dispatch import dispatch_orders
+from foodcartapp.models import Order
+
+
+class Command(BaseCommand):
+    help = 'Назначает рестораны необработанным заказам с известным адресом'
+
+    def handle(self, *args, **options):
+        orders = list(
+            Order.objects
+            .filter(status='NEW', restaurant=None)
+            .exclude(place=None)
+            .select_related('place')
+            .order_by('registrated_at')
+        )
+        dispatched_orders = dispatch_orders(orders)
+        self.stdout.write(self.style.SUCCESS(f'Назначено заказов: {len(dispatched_orders)} из {len(orders)}'))
@@ -0,0 +1,48 @@
+import csv
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from foodcartapp.models import Place
+
+FIELDS = ['address', 'latitude', 'longitude', 'request_to_geocoder_at']
+
+
+class Command(BaseCommand):
+    help = 'Выгружает координаты адресов в CSV или NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-', help='Путь к файлу, по умолчанию stdout')
+        parser.add_argument('--format', choices=['csv', 'ndjson'], default='csv')
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        if options['path'] == '-':
+            self.dump(self.stdout, options['format'], options['chunk_size'])
+            return
+        with open(options['path'], 'w', encoding='utf-8', newline='') as file:
+            self.dump(file, options['format'], options['chunk_size'])
+
+    def dump(self, file, file_format, chunk_size):
+        started_at = time.monotonic()
+        places = Place.objects.order_by('id').values_list(*FIELDS).iterator(chunk_size=chunk_size)
+
+        if file_format == 'csv':
+            writer = csv.writer(file)
+            writer.writerow(FIELDS)
+
+        rows_count = 0
+        for address, latitude, longitude, request_to_geocoder_at in places:
+            row = [address, str(latitude), str(longitude), request_to_geocoder_at.isoformat()]
+            if file_format == 'csv':
+                writer.writerow(row)
+            else:
+                file.write(json.dumps(dict(zip(FIELDS, row)), ensure_ascii=False) + '\n')
+
+            rows_count += 1
+            if not rows_count % chunk_size:
+                self.stderr.write(f'Выгружено строк: {rows_count}, {rows_count / (time.monotonic() - started_at):,.0f} строк/с')
+
+        elapsed = time.monotonic() - started_at
+        self.stderr.write(f'Готово: {rows_count} строк за {elapsed:.1f} с')
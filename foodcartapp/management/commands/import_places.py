@@ -0,0 +1,112 @@
+import csv
+import itertools
+import json
+import sys
+import time
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from foodcartapp.addresses import normalize_address
+from foodcartapp.models import Place
+
+
+def read_csv(file):
+    yield from csv.DictReader(file)
+
+
+def read_ndjson(file):
+    '''
+    Malformed lines are yielded as None to be counted as skipped.
+    '''
+    for line in file:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield None
+
+
+READERS = {
+    'csv': read_csv,
+    'ndjson': read_ndjson,
+}
+
+
+def parse_place(row):
+    if not isinstance(row, dict):
+        return
+    address = str(row.get('address') or '').strip()[:500]
+    try:
+        latitude = Decimal(str(row.get('latitude')))
+        longitude = Decimal(str(row.get('longitude')))
+        if not latitude.is_finite() or not longitude.is_finite():
+            return
+        latitude = latitude.quantize(Decimal('0.000001'))
+        longitude = longitude.quantize(Decimal('0.000001'))
+        request_to_geocoder_at = parse_datetime(str(row.get('request_to_geocoder_at') or '')) or timezone.now()
+    except (InvalidOperation, ValueError):
+        return
+    if not address or not -90 <= latitude <= 90 or not -180 <= longitude <= 180:
+        return
+    return Place(
+        address=address,
+        canonical_address=normalize_address(address),
+        latitude=latitude,
+        longitude=longitude,
+        request_to_geocoder_at=request_to_geocoder_at,
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает координаты адресов из CSV или NDJSON '
+        '(поля address, latitude, longitude и необязательное request_to_geocoder_at)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к файлу или «-» для чтения из stdin')
+        parser.add_argument('--format', choices=READERS.keys(), help='По умолчанию — по расширению файла')
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        file_format = options['format'] or options['path'].rsplit('.', 1)[-1].lower()
+        if file_format not in READERS:
+            raise CommandError('Укажите формат файла: --format csv или --format ndjson')
+
+        if options['path'] == '-':
+            self.load(READERS[file_format](sys.stdin), options['chunk_size'])
+            return
+        with open(options['path'], encoding='utf-8', newline='') as file:
+            self.load(READERS[file_format](file), options['chunk_size'])
+
+    def load(self, rows, chunk_size):
+        '''
+        Rows are read and inserted chunk by chunk, so memory does not depend on the file size.
+        Addresses already in the database are left untouched.
+        '''
+        started_at = time.monotonic()
+        rows_count = 0
+        skipped_count = 0
+        while True:
+            chunk = list(itertools.islice(rows, chunk_size))
+            if not chunk:
+                break
+
+            places = [parse_place(row) for row in chunk]
+            valid_places = [place for place in places if place]
+            Place.objects.bulk_create(valid_places, ignore_conflicts=True)
+
+            rows_count += len(chunk)
+            skipped_count += len(places) - len(valid_places)
+            elapsed = time.monotonic() - started_at
+            self.stderr.write(f'Обработано строк: {rows_count}, {rows_count / elapsed:,.0f} строк/с')
+
+        elapsed = time.monotonic() - started_at
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: {rows_count} строк за {elapsed:.1f} с, пропущено некорректных: {skipped_count}. '
+            'Адреса, которые уже были в базе, не изменены.'
+        ))
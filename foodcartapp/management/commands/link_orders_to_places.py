@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from foodcartapp.geo_services import enqueue_geocoding, link_orders_to_places
+from foodcartapp.models import Order
+
+
+class Command(BaseCommand):
+    help = 'Привязывает заказы без места к уже известным местам по адресу'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--geocode', action='store_true',
+                            help='Поставить в очередь на геокодирование адреса, для которых места нет')
+
+    def handle(self, *args, **options):
+        orders = Order.objects.filter(place=None).only('id', 'address').order_by('id')
+
+        linked_count = unlinked_count = 0
+        last_id = 0
+        while True:
+            batch = list(orders.filter(id__gt=last_id)[:options['batch_size']])
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            linked_orders = link_orders_to_places(batch)
+            linked_count += len(linked_orders)
+            unlinked_addresses = {order.address for order in batch if order.address and not order.place_id}
+            unlinked_count += len(batch) - len(linked_orders)
+            if options['geocode']:
+                enqueue_geocoding(unlinked_addresses)
+
+        self.stdout.write(self.style.SUCCESS(f'Привязано заказов: {linked_count}, без места: {unlinked_count}'))
@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from foodcartapp.addresses import normalize_address
+from foodcartapp.candidates import enqueue_candidates_refresh
+from foodcartapp.models import Order, Place
+
+
+class Command(BaseCommand):
+    help = 'Объединяет места с одинаковым нормализованным адресом, оставляя самые свежие координаты'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--renormalize', action='store_true',
+                            help='Пересчитать нормализованные адреса перед объединением')
+        parser.add_argument('--dry-run', action='store_true', help='Только показать, что будет удалено')
+
+    def handle(self, *args, **options):
+        if options['renormalize']:
+            self.renormalize()
+
+        duplicated_addresses = (
+            Place.objects
+            .values('canonical_address')
+            .annotate(places_count=Count('id'))
+            .filter(places_count__gt=1)
+            .values_list('canonical_address', flat=True)
+        )
+
+        removed_count = 0
+        kept_places_ids = []
+        for canonical_address in list(duplicated_addresses):
+            places = list(
+                Place.objects
+                .filter(canonical_address=canonical_address)
+                .order_by('-request_to_geocoder_at', '-id')
+            )
+            kept_place, *duplicates = places
+            self.stdout.write(f'{kept_place.address}: удаляем {", ".join(place.address for place in duplicates)}')
+            if not options['dry_run']:
+                with transaction.atomic():
+                    Order.objects.filter(place__in=duplicates).update(place=kept_place)
+                    Place.objects.filter(id__in=[place.id for place in duplicates]).delete()
+                kept_places_ids.append(kept_place.id)
+            removed_count += len(duplicates)
+
+        # Orders of removed places moved to the kept ones and may be closer to other restaurants now.
+        enqueue_candidates_refresh(places_ids=kept_places_ids)
+
+        self.stdout.write(self.style.SUCCESS(f'Удалено дубликатов: {removed_count}'))
+
+    def renormalize(self):
+        changed_places = []
+        for place in Place.objects.only('id', 'address', 'canonical_address').iterator():
+            canonical_address = normalize_address(place.address)
+            if canonical_address != place.canonical_address:
+                place.canonical_address = canonical_address
+                changed_places.append(place)
+        Place.objects.bulk_update(changed_places, ['canonical_address'], batch_size=500)
+        self.stdout.write(f'Обновлено нормализованных адресов: {len(changed_places)}')
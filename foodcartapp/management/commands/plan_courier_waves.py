@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from foodcartapp.models import Order
+from foodcartapp.routing import plan_courier_waves
+
+
+class Command(BaseCommand):
+    help = 'Разбивает необработанные заказы каждого ресторана на рейсы курьеров'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--capacity', type=int, default=settings.COURIER_CAPACITY,
+                            help='Сколько заказов курьер берёт за рейс')
+        parser.add_argument('--time-budget', type=float, default=settings.ROUTING_TIME_BUDGET,
+                            help='Сколько секунд улучшать маршруты одного ресторана')
+
+    def handle(self, *args, **options):
+        orders = (
+            Order.objects
+            .filter(status='NEW')
+            .exclude(restaurant=None)
+            .exclude(place=None)
+            .select_related('restaurant', 'place')
+            .order_by('registrated_at')
+        )
+        waves = plan_courier_waves(orders, options['capacity'], options['time_budget'])
+
+        for restaurant, trips in waves.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{restaurant} — рейсов: {len(trips)}'))
+            for number, (trip_orders, trip_length) in enumerate(trips, start=1):
+                addresses = ' → '.join(f'№{order.id} {order.address}' for order in trip_orders)
+                self.stdout.write(f'  {number}. {trip_length:.1f} км: {addresses}')
@@ -0,0 +1,34 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from foodcartapp.geo_services import refresh_places
+from foodcartapp.models import Place
+
+
+class Command(BaseCommand):
+    help = 'Заново геокодирует устаревшие места, не превышая заданную частоту запросов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-age-days', type=int, default=settings.PLACE_MAX_AGE_DAYS)
+        parser.add_argument('--limit', type=int, default=1000, help='Сколько мест обновить за запуск')
+        parser.add_argument('--rate', type=int, default=5, help='Запросов к геокодеру в секунду')
+
+    def handle(self, *args, **options):
+        stale_before = timezone.now() - timedelta(days=options['max_age_days'])
+        places = list(
+            Place.objects
+            .filter(request_to_geocoder_at__lt=stale_before)
+            .order_by('request_to_geocoder_at')[:options['limit']]
+        )
+
+        refreshed_count = 0
+        for start in range(0, len(places), options['rate']):
+            started_at = time.monotonic()
+            refreshed_count += len(refresh_places(places[start:start + options['rate']]))
+            time.sleep(max(1 - (time.monotonic() - started_at), 0))
+
+        self.stdout.write(self.style.SUCCESS(f'Обновлено мест: {refreshed_count} из {len(places)}'))
@@ -0,0 +1,47 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from foodcartapp.changes import order_changes
+from foodcartapp.jobs import claim_jobs, purge_done_jobs, run_jobs
+
+PURGE_INTERVAL = 60 * 60
+
+
+class Command(BaseCommand):
+    help = 'Выполняет фоновые задачи из очереди'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Выполнить накопившиеся задачи и выйти')
+        parser.add_argument('--batch-size', type=int, default=20)
+        parser.add_argument('--sleep', type=float, default=1, help='Пауза между опросами очереди, сек.')
+        parser.add_argument(
+            '--purge-older-than', type=float, default=settings.JOBS_DONE_RETENTION_DAYS,
+            help='Удалять выполненные задачи старше стольких дней',
+        )
+
+    def handle(self, *args, **options):
+        retention = timedelta(days=options['purge_older_than'])
+        purged_at = None
+        while True:
+            if purged_at is None or time.monotonic() - purged_at > PURGE_INTERVAL:
+                deleted = purge_done_jobs(retention)
+                if deleted:
+                    self.stdout.write(f'Удалено выполненных задач: {deleted}')
+                order_changes.purge(timedelta(seconds=settings.ORDER_CHANGES_RETENTION))
+                purged_at = time.monotonic()
+
+            jobs = claim_jobs(options['batch_size'])
+            if not jobs:
+                if options['once']:
+                    return
+                time.sleep(options['sleep'])
+                continue
+
+            for job, done in run_jobs(jobs):
+                if done:
+                    self.stdout.write(f'{job}: выполнено')
+                else:
+                    self.stderr.write(f'{job}: ошибка, попытка {job.attempts}')
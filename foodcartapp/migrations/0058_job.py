@@ -0,0 +1,33 @@
+# Generated by Django 3.2.5 on 2026-10-17 20:34
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0057_auto_20210224_1440'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(db_index=True, max_length=50, verbose_name='Задача')),
+                ('key', models.CharField(blank=True, db_index=True, max_length=500, verbose_name='Ключ')),
+                ('payload', models.JSONField(blank=True, default=dict, verbose_name='Параметры')),
+                ('status', models.CharField(choices=[('NEW', 'В очереди'), ('IN_PROGRESS', 'Выполняется'), ('DONE', 'Выполнено'), ('FAILED', 'Ошибка')], db_index=True, default='NEW', max_length=15, verbose_name='Статус')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Попыток')),
+                ('run_after', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Выполнить после')),
+                ('last_error', models.TextField(blank=True, verbose_name='Последняя ошибка')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Создана в')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Завершена в')),
+            ],
+            options={
+                'verbose_name': 'фоновая задача',
+                'verbose_name_plural': 'фоновые задачи',
+            },
+        ),
+    ]
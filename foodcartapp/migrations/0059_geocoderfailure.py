@@ -0,0 +1,28 @@
+# Generated by Django 3.2.5 on 2026-10-17 20:38
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0058_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeocoderFailure',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('address', models.CharField(max_length=500, unique=True, verbose_name='Адрес')),
+                ('reason', models.CharField(choices=[('NOT_FOUND', 'Адрес не найден'), ('ERROR', 'Геокодер недоступен')], max_length=15, verbose_name='Причина')),
+                ('failed_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Ошибка получена')),
+                ('expires_at', models.DateTimeField(db_index=True, verbose_name='Повторить запрос после')),
+            ],
+            options={
+                'verbose_name': 'неудачный запрос к геокодеру',
+                'verbose_name_plural': 'неудачные запросы к геокодеру',
+            },
+        ),
+    ]
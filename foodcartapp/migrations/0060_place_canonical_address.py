@@ -0,0 +1,39 @@
+from django.db import migrations, models
+
+from foodcartapp.addresses import normalize_address
+
+
+def fill_canonical_addresses(apps, schema_editor):
+    Place = apps.get_model('foodcartapp', 'Place')
+    places = Place.objects.only('id', 'address')
+    for place in places.iterator():
+        place.canonical_address = normalize_address(place.address)
+        place.save(update_fields=['canonical_address'])
+
+
+def clear_geocoder_failures(apps, schema_editor):
+    GeocoderFailure = apps.get_model('foodcartapp', 'GeocoderFailure')
+    GeocoderFailure.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0059_geocoderfailure'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='place',
+            name='canonical_address',
+            field=models.CharField(db_index=True, default='', max_length=500, verbose_name='Нормализованный адрес'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_canonical_addresses, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='geocoderfailure',
+            name='address',
+            field=models.CharField(max_length=500, unique=True, verbose_name='Нормализованный адрес'),
+        ),
+        migrations.RunPython(clear_geocoder_failures, migrations.RunPython.noop),
+    ]
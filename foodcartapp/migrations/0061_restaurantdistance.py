@@ -0,0 +1,30 @@
+# Generated by Django 3.2.5 on 2026-10-17 20:49
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0060_place_canonical_address'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RestaurantDistance',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('distance', models.DecimalField(decimal_places=2, max_digits=8, verbose_name='Расстояние, км')),
+                ('calculated_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Рассчитано в')),
+                ('place', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='restaurant_distances', to='foodcartapp.place', verbose_name='Место')),
+                ('restaurant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='distances', to='foodcartapp.restaurant', verbose_name='Ресторан')),
+            ],
+            options={
+                'verbose_name': 'расстояние до ресторана',
+                'verbose_name_plural': 'расстояния до ресторанов',
+                'unique_together': {('restaurant', 'place')},
+            },
+        ),
+    ]
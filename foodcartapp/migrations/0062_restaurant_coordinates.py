@@ -0,0 +1,41 @@
+# Generated by Django 3.2.5 on 2026-10-17 20:51
+
+from django.db import migrations, models
+
+from foodcartapp.addresses import normalize_address
+
+
+def copy_coordinates_from_places(apps, schema_editor):
+    Place = apps.get_model('foodcartapp', 'Place')
+    Restaurant = apps.get_model('foodcartapp', 'Restaurant')
+    coordinates = {
+        canonical_address: (latitude, longitude)
+        for canonical_address, latitude, longitude
+        in Place.objects.values_list('canonical_address', 'latitude', 'longitude')
+    }
+    for restaurant in Restaurant.objects.only('id', 'address').iterator():
+        restaurant_coordinates = coordinates.get(normalize_address(restaurant.address))
+        if restaurant_coordinates:
+            restaurant.latitude, restaurant.longitude = restaurant_coordinates
+            restaurant.save(update_fields=['latitude', 'longitude'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0061_restaurantdistance'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='restaurant',
+            name='latitude',
+            field=models.DecimalField(blank=True, decimal_places=6, help_text='Заполняется автоматически по адресу', max_digits=9, null=True, verbose_name='широта'),
+        ),
+        migrations.AddField(
+            model_name='restaurant',
+            name='longitude',
+            field=models.DecimalField(blank=True, decimal_places=6, help_text='Заполняется автоматически по адресу', max_digits=9, null=True, verbose_name='долгота'),
+        ),
+        migrations.RunPython(copy_coordinates_from_places, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 3.2.5 on 2026-10-17 20:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0062_restaurant_coordinates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='place',
+            field=models.ForeignKey(blank=True, help_text='Заполняется после геокодирования адреса', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='orders', to='foodcartapp.place', verbose_name='Место'),
+        ),
+    ]
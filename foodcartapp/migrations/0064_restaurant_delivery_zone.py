@@ -0,0 +1,18 @@
+# Generated by Django 3.2.5 on 2026-10-17 20:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0063_order_place'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='restaurant',
+            name='delivery_zone',
+            field=models.JSONField(blank=True, help_text='GeoJSON с типом Polygon или MultiPolygon, например нарисованный на geojson.io. Без зоны ресторан доставляет по любому адресу', null=True, verbose_name='зона доставки'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 3.2.5 on 2026-10-17 21:07
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0065_order_restaurant'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='candidates_updated_at',
+            field=models.DateTimeField(blank=True, help_text='Пусто, если подходящие рестораны нужно подобрать заново', null=True, verbose_name='Рестораны подобраны в'),
+        ),
+        migrations.CreateModel(
+            name='OrderCandidate',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('distance', models.DecimalField(blank=True, decimal_places=2, help_text='Пусто, если координаты ещё неизвестны', max_digits=8, null=True, verbose_name='Расстояние, км')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='candidates', to='foodcartapp.order', verbose_name='Заказ')),
+                ('restaurant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='order_candidates', to='foodcartapp.restaurant', verbose_name='Ресторан')),
+            ],
+            options={
+                'verbose_name': 'подходящий ресторан',
+                'verbose_name_plural': 'подходящие рестораны',
+                'unique_together': {('order', 'restaurant')},
+            },
+        ),
+    ]
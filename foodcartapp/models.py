@@ -1,9 +1,13 @@
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator
 from django.db import models
 from django.db.models import F, Sum
 from django.utils import timezone
 from phonenumber_field.modelfields import PhoneNumberField
 
+from .addresses import normalize_address
+from .zones import parse_zone
+
 
 class OrderQuerySet(models.QuerySet):
 
@@ -15,6 +19,15 @@ class Restaurant(models.Model):
     name = models.CharField('название', max_length=50, db_index=True)
     address = models.CharField('адрес', max_length=100, blank=True)
     contact_phone = models.CharField('контактный телефон', max_length=50, blank=True)
+    latitude = models.DecimalField('широта', max_digits=9, decimal_places=6, null=True, blank=True,
+                                   help_text='Заполняется автоматически по адресу')
+    longitude = models.DecimalField('долгота', max_digits=9, decimal_places=6, null=True, blank=True,
+                                    help_text='Заполняется автоматически по адресу')
+    delivery_zone = models.JSONField(
+        'зона доставки', null=True, blank=True,
+        help_text='GeoJSON с типом Polygon или MultiPolygon, например нарисованный на geojson.io. '
+                  'Без зоны ресторан доставляет по любому адресу',
+    )
 
     class Meta:
         verbose_name = 'ресторан'
@@ -23,6 +36,19 @@ class Restaurant(models.Model):
     def __str__(self):
         return self.name
 
+    def clean(self):
+        if self.delivery_zone is not None:
+            try:
+                parse_zone(self.delivery_zone)
+            except ValueError as error:
+                raise ValidationError({'delivery_zone': str(error)})
+
+    @property
+    def coordinates(self):
+        if self.latitude is None or self.longitude is None:
+            return None
+        return self.latitude, self.longitude
+
 
 class ProductQuerySet(models.QuerySet):
     def available(self):
@@ -137,6 +163,10 @@ class Order(models.Model):
     lastname = models.CharField(max_length=200, verbose_name='Фамилия')
     phonenumber = PhoneNumberField(verbose_name='Телефон')
     address = models.CharField(max_length=500, verbose_name='Адрес')
+    place = models.ForeignKey('Place', on_delete=models.SET_NULL, null=True, blank=True, related_name='orders',
+                              verbose_name='Место', help_text='Заполняется после геокодирования адреса')
+    restaurant = models.ForeignKey(Restaurant, on_delete=models.SET_NULL, null=True, blank=True, related_name='orders',
+                                   verbose_name='Ресторан', help_text='Назначается автоматически, когда известен адрес')
     payment_method = models.CharField(max_length=5, choices=PAYMENT_METHOD_CHOICES, blank=True,
                                       db_index=True, verbose_name='Способ оплаты')
     status = models.CharField(max_length=15, choices=ORDER_STATUS_CHOICES, default='NEW',
@@ -145,6 +175,8 @@ class Order(models.Model):
     registrated_at = models.DateTimeField(default=timezone.now, db_index=True, verbose_name='Зарегистрирован в')
     called_at = models.DateTimeField(null=True, blank=True, db_index=True, verbose_name='Позвонили в')
     delivered_at = models.DateTimeField(null=True, blank=True, db_index=True, verbose_name='Доставлен в')
+    candidates_updated_at = models.DateTimeField(null=True, blank=True, verbose_name='Рестораны подобраны в',
+                                                 help_text='Пусто, если подходящие рестораны нужно подобрать заново')
 
     objects = OrderQuerySet.as_manager()
 
@@ -172,6 +204,7 @@ class OrderProduct(models.Model):
 
 class Place(models.Model):
     address = models.CharField(max_length=500, verbose_name='Адрес', unique=True)
+    canonical_address = models.CharField(max_length=500, db_index=True, verbose_name='Нормализованный адрес')
     latitude = models.DecimalField(max_digits=9, decimal_places=6, verbose_name='Широта')
     longitude = models.DecimalField(max_digits=9, decimal_places=6, verbose_name='Долгота')
     request_to_geocoder_at = models.DateTimeField(default=timezone.now, db_index=True,
@@ -183,3 +216,104 @@ class Place(models.Model):
 
     def __str__(self):
         return self.address
+
+    def save(self, *args, **kwargs):
+        self.canonical_address = normalize_address(self.address)
+        super().save(*args, **kwargs)
+
+
+class Job(models.Model):
+
+    STATUS_CHOICES = [
+        ('NEW', 'В очереди'),
+        ('IN_PROGRESS', 'Выполняется'),
+        ('DONE', 'Выполнено'),
+        ('FAILED', 'Ошибка'),
+    ]
+
+    name = models.CharField(max_length=50, db_index=True, verbose_name='Задача')
+    key = models.CharField(max_length=500, blank=True, db_index=True, verbose_name='Ключ')
+    payload = models.JSONField(default=dict, blank=True, verbose_name='Параметры')
+    status = models.CharField(max_length=15, choices=STATUS_CHOICES, default='NEW',
+                              db_index=True, verbose_name='Статус')
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name='Попыток')
+    run_after = models.DateTimeField(default=timezone.now, db_index=True, verbose_name='Выполнить после')
+    last_error = models.TextField(blank=True, verbose_name='Последняя ошибка')
+    created_at = models.DateTimeField(default=timezone.now, verbose_name='Создана в')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='Завершена в')
+
+    class Meta:
+        verbose_name = 'фоновая задача'
+        verbose_name_plural = 'фоновые задачи'
+
+    def __str__(self):
+        return f'{self.name} {self.key}'
+
+
+class GeocoderFailure(models.Model):
+
+    REASON_CHOICES = [
+        ('NOT_FOUND', 'Адрес не найден'),
+        ('ERROR', 'Геокодер недоступен'),
+    ]
+
+    address = models.CharField(max_length=500, verbose_name='Нормализованный адрес', unique=True)
+    reason = models.CharField(max_length=15, choices=REASON_CHOICES, verbose_name='Причина')
+    failed_at = models.DateTimeField(default=timezone.now, verbose_name='Ошибка получена')
+    expires_at = models.DateTimeField(db_index=True, verbose_name='Повторить запрос после')
+
+    class Meta:
+        verbose_name = 'неудачный запрос к геокодеру'
+        verbose_name_plural = 'неудачные запросы к геокодеру'
+
+    def __str__(self):
+        return f'{self.address} ({self.get_reason_display()})'
+
+
+class RestaurantDistance(models.Model):
+    restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE, related_name='distances',
+                                   verbose_name='Ресторан')
+    place = models.ForeignKey(Place, on_delete=models.CASCADE, related_name='restaurant_distances',
+                              verbose_name='Место')
+    distance = models.DecimalField(max_digits=8, decimal_places=2, verbose_name='Расстояние, км')
+    calculated_at = models.DateTimeField(default=timezone.now, verbose_name='Рассчитано в')
+
+    class Meta:
+        verbose_name = 'расстояние до ресторана'
+        verbose_name_plural = 'расстояния до ресторанов'
+        unique_together = [
+            ['restaurant', 'place']
+        ]
+
+    def __str__(self):
+        return f'{self.restaurant} — {self.place}: {self.distance} км'
+
+
+class OrderCandidate(models.Model):
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='candidates', verbose_name='Заказ')
+    restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE, related_name='order_candidates',
+                                   verbose_name='Ресторан')
+    distance = models.DecimalField(max_digits=8, decimal_places=2, null=True, blank=True,
+                                   verbose_name='Расстояние, км', help_text='Пусто, если координаты ещё неизвестны')
+
+    class Meta:
+        verbose_name = 'подходящий ресторан'
+        verbose_name_plural = 'подходящие рестораны'
+        unique_together = [
+            ['order', 'restaurant']
+        ]
+
+    def __str__(self):
+        return f'{self.order} — {self.restaurant}'
+
+
+class OrderChange(models.Model):
+    order_id = models.PositiveIntegerField(verbose_name='ID заказа')
+    changed_at = models.DateTimeField(default=timezone.now, db_index=True, verbose_name='Изменён в')
+
+    class Meta:
+        verbose_name = 'изменение заказа'
+        verbose_name_plural = 'изменения заказов'
+
+    def __str__(self):
+        return f'{self.order_id} {self.changed_at}'
@@ -0,0 +1,135 @@
+import time
+from collections import defaultdict
+
+import numpy as np
+from django.conf import settings
+
+from .distances import distance_matrix
+
+
+def route_length(matrix, route):
+    route = np.asarray(route)
+    return float(matrix[route[:-1], route[1:]].sum())
+
+
+def nearest_insertion(matrix):
+    '''
+    Closed tour from the depot (node 0) through all other nodes: the node nearest to the tour
+    is inserted where it lengthens the tour the least. Returns the tour with the depot at both ends.
+    '''
+    nodes_count = len(matrix)
+    tour = [0, 0]
+    distance_to_tour = matrix[0].copy()
+    distance_to_tour[0] = np.inf
+
+    for _ in range(nodes_count - 1):
+        node = int(np.argmin(distance_to_tour))
+        starts = np.array(tour[:-1])
+        ends = np.array(tour[1:])
+        insertion_costs = matrix[starts, node] + matrix[node, ends] - matrix[starts, ends]
+        position = int(np.argmin(insertion_costs)) + 1
+        tour.insert(position, node)
+
+        distance_to_tour = np.minimum(distance_to_tour, matrix[node])
+        distance_to_tour[tour] = np.inf
+    return tour
+
+
+def two_opt(matrix, tour, deadline=None):
+    '''
+    Reverse tour segments while that makes the tour shorter, or until `deadline` (time.monotonic()).
+    All reversals starting at one position are evaluated at once with numpy.
+    '''
+    tour = np.array(tour)
+    improved = True
+    while improved:
+        improved = False
+        for start in range(1, len(tour) - 2):
+            if deadline is not None and time.monotonic() > deadline:
+                return tour.tolist()
+            before_start = tour[start - 1]
+            ends = tour[start + 1:-1]
+            after_ends = tour[start + 2:]
+            deltas = (
+                matrix[before_start, ends] + matrix[tour[start], after_ends]
+                - matrix[before_start, tour[start]] - matrix[ends, after_ends]
+            )
+            best = int(np.argmin(deltas))
+            if deltas[best] < -1e-9:
+                end = start + 1 + best
+                tour[start:end + 1] = tour[start:end + 1][::-1]
+                improved = True
+    return tour.tolist()
+
+
+def split_tour(matrix, tour, capacity):
+    '''
+    Cut the giant tour into trips of at most `capacity` nodes, each starting and ending at the depot,
+    with the least total length (dynamic programming over cut positions).
+    '''
+    nodes = tour[1:-1]
+    nodes_count = len(nodes)
+    path_lengths = np.concatenate([[0], np.cumsum(matrix[nodes[:-1], nodes[1:]])]) if nodes else np.zeros(0)
+
+    best_lengths = np.full(nodes_count + 1, np.inf)
+    best_lengths[0] = 0
+    previous_cuts = np.zeros(nodes_count + 1, dtype=int)
+    for end in range(1, nodes_count + 1):
+        for start in range(max(0, end - capacity), end):
+            trip_length = (
+                matrix[0, nodes[start]] + path_lengths[end - 1] - path_lengths[start] + matrix[nodes[end - 1], 0]
+            )
+            if best_lengths[start] + trip_length < best_lengths[end]:
+                best_lengths[end] = best_lengths[start] + trip_length
+                previous_cuts[end] = start
+
+    trips = []
+    end = nodes_count
+    while end > 0:
+        start = previous_cuts[end]
+        trips.append([0, *nodes[start:end], 0])
+        end = start
+    return trips[::-1]
+
+
+def plan_trips(depot, points, capacity=None, time_budget=None):
+    '''
+    Courier trips from the depot to the points: lists of point indexes in delivery order and trip lengths in km.
+    Half of `time_budget` seconds goes to improving the whole tour, the rest to improving single trips.
+    '''
+    if capacity is None:
+        capacity = settings.COURIER_CAPACITY
+    if time_budget is None:
+        time_budget = settings.ROUTING_TIME_BUDGET
+    if not points:
+        return []
+    started_at = time.monotonic()
+
+    matrix = distance_matrix([depot, *points], [depot, *points], exact=False)
+    tour = two_opt(matrix, nearest_insertion(matrix), deadline=started_at + time_budget / 2)
+
+    trips = []
+    for trip in split_tour(matrix, tour, capacity):
+        trip = two_opt(matrix, trip, deadline=started_at + time_budget)
+        trips.append(([node - 1 for node in trip[1:-1]], route_length(matrix, trip)))
+    return trips
+
+
+def plan_courier_waves(orders, capacity=None, time_budget=None):
+    '''
+    Group geocoded orders by their restaurant and split them into courier trips.
+    Returns {restaurant: [(orders in delivery order, trip length in km)]}.
+    '''
+    orders_by_restaurant = defaultdict(list)
+    for order in orders:
+        if order.restaurant and order.restaurant.coordinates and order.place:
+            orders_by_restaurant[order.restaurant].append(order)
+
+    waves = {}
+    for restaurant, restaurant_orders in orders_by_restaurant.items():
+        points = [(order.place.latitude, order.place.longitude) for order in restaurant_orders]
+        trips = plan_trips(restaurant.coordinates, points, capacity, time_budget)
+        waves[restaurant] = [
+            ([restaurant_orders[index] for index in trip], trip_length) for trip, trip_length in trips
+        ]
+    return waves
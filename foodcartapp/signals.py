@@ -0,0 +1,119 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .candidates import enqueue_candidates_refresh
+from .changes import bump_restaurants_version, publish_order_changes
+from .eligibility import update_eligibility
+from .geo_services import coordinates_cache, enqueue_restaurants_geocoding, forget_distances, get_coordinates_many
+from .load import load_counters
+from .models import Order, OrderProduct, Place, Restaurant, RestaurantDistance, RestaurantMenuItem
+from .spatial import invalidate_restaurant_index
+
+
+@receiver([post_save, post_delete], sender=Place)
+def evict_place_from_cache(sender, instance, **kwargs):
+    coordinates_cache.delete(instance.canonical_address)
+
+
+@receiver(post_save, sender=Place)
+def forget_place_distances(sender, instance, created, **kwargs):
+    if not created:
+        forget_distances([instance])
+        enqueue_candidates_refresh(places_ids=[instance.id])
+
+
+@receiver([post_save, post_delete], sender=Restaurant)
+def rebuild_restaurant_index(sender, instance, **kwargs):
+    invalidate_restaurant_index()
+    bump_restaurants_version()
+
+
+@receiver(post_save, sender=RestaurantMenuItem)
+def update_menu_item_eligibility(sender, instance, **kwargs):
+    update_eligibility(instance.restaurant_id, instance.product_id, instance.availability)
+    enqueue_candidates_refresh(products_ids=[instance.product_id])
+
+
+@receiver(post_delete, sender=RestaurantMenuItem)
+def remove_menu_item_eligibility(sender, instance, **kwargs):
+    update_eligibility(instance.restaurant_id, instance.product_id, False)
+    enqueue_candidates_refresh(products_ids=[instance.product_id])
+
+
+@receiver(pre_save, sender=Restaurant)
+def locate_restaurant(sender, instance, **kwargs):
+    '''
+    A moved restaurant takes coordinates of a known place or waits for the geocoder,
+    unless coordinates were set by hand along with the address.
+    Candidates of orders are outdated only by a new restaurant, new coordinates or delivery zone.
+    '''
+    previous = {'address': None, 'latitude': None, 'longitude': None, 'delivery_zone': None}
+    created = True
+    if instance.pk:
+        saved = Restaurant.objects.filter(pk=instance.pk).values(*previous).first()
+        created = saved is None
+        previous = saved or previous
+    instance._needs_geocoding = False
+
+    if previous['address'] != instance.address and (
+        instance.coordinates is None
+        or (instance.latitude, instance.longitude) == (previous['latitude'], previous['longitude'])
+    ):
+        coordinates = get_coordinates_many([instance.address])
+        instance.latitude, instance.longitude = coordinates.get(instance.address) or (None, None)
+        instance._needs_geocoding = bool(instance.address) and instance.address not in coordinates
+
+    moved = (instance.latitude, instance.longitude) != (previous['latitude'], previous['longitude'])
+    if instance.pk and moved:
+        RestaurantDistance.objects.filter(restaurant=instance).delete()
+    instance._candidates_outdated = created or moved or instance.delivery_zone != previous['delivery_zone']
+
+
+@receiver(post_save, sender=Restaurant)
+def geocode_restaurant(sender, instance, **kwargs):
+    if getattr(instance, '_needs_geocoding', False):
+        enqueue_restaurants_geocoding([instance])
+
+
+@receiver(post_save, sender=Restaurant)
+def refresh_restaurant_candidates(sender, instance, **kwargs):
+    if getattr(instance, '_candidates_outdated', True):
+        enqueue_candidates_refresh(all_orders=True)
+
+
+@receiver(pre_save, sender=Order)
+def remember_order_state(sender, instance, **kwargs):
+    '''
+    A moved order loses its place and candidates; the previous status and restaurant are kept to update the load counters.
+    '''
+    instance._previous_state = None
+    if not instance.pk:
+        return
+    previous = Order.objects.filter(pk=instance.pk).values('address', 'status', 'restaurant_id').first()
+    if not previous:
+        return
+    instance._previous_state = (previous['status'], previous['restaurant_id'])
+    if previous['address'] != instance.address:
+        instance.place = None
+        instance.candidates_updated_at = None
+
+
+@receiver(post_save, sender=Order)
+def count_restaurant_load(sender, instance, **kwargs):
+    load_counters.track(getattr(instance, '_previous_state', None), (instance.status, instance.restaurant_id))
+
+
+@receiver(post_delete, sender=Order)
+def discount_restaurant_load(sender, instance, **kwargs):
+    load_counters.track((instance.status, instance.restaurant_id), None)
+
+
+@receiver([post_save, post_delete], sender=Order)
+def publish_order_change(sender, instance, **kwargs):
+    publish_order_changes([instance.id])
+
+
+@receiver([post_save, post_delete], sender=OrderProduct)
+def outdate_order_candidates(sender, instance, **kwargs):
+    Order.objects.filter(id=instance.order_id).exclude(candidates_updated_at=None).update(candidates_updated_at=None)
+    publish_order_changes([instance.order_id])
@@ -0,0 +1,173 @@
+import heapq
+import logging
+import math
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+
+from .distances import EARTH_RADIUS_KM, distance_matrix, to_km
+from .models import Restaurant
+from .zones import ZoneIndex, parse_zone
+
+logger = logging.getLogger(__name__)
+
+
+def to_unit_vectors(points):
+    '''
+    Points on the unit sphere: the chord between two of them grows monotonically
+    with the great-circle distance, so a plain euclidean KD-tree finds nearest points on the globe.
+    '''
+    latitudes, longitudes = np.radians(np.asarray(points, dtype=float).reshape(-1, 2)).T
+    return np.column_stack([
+        np.cos(latitudes) * np.cos(longitudes),
+        np.cos(latitudes) * np.sin(longitudes),
+        np.sin(latitudes),
+    ])
+
+
+def km_to_chord(km):
+    return 2 * math.sin(min(km / EARTH_RADIUS_KM, math.pi) / 2)
+
+
+class KDTree:
+
+    def __init__(self, points):
+        self.points = to_unit_vectors(points)
+        self.root = self._build(list(range(len(self.points))), depth=0)
+
+    def _build(self, indexes, depth):
+        if not indexes:
+            return
+        axis = depth % 3
+        indexes.sort(key=lambda index: self.points[index][axis])
+        median = len(indexes) // 2
+        return (
+            indexes[median],
+            axis,
+            self._build(indexes[:median], depth + 1),
+            self._build(indexes[median + 1:], depth + 1),
+        )
+
+    def query(self, point, k=None, radius_km=None, accept=None):
+        '''
+        Indexes of the `k` nearest points within `radius_km` for which `accept(index)` is true,
+        nearest first.
+        '''
+        target = to_unit_vectors([point])[0]
+        max_chord = km_to_chord(radius_km) if radius_km is not None else math.inf
+        found = []
+
+        def bound():
+            if k is not None and len(found) == k:
+                return min(max_chord, -found[0][0])
+            return max_chord
+
+        def search(node):
+            if node is None:
+                return
+            index, axis, left, right = node
+            chord = math.dist(target, self.points[index])
+            if chord <= bound() and (accept is None or accept(index)):
+                heapq.heappush(found, (-chord, index))
+                if k is not None and len(found) > k:
+                    heapq.heappop(found)
+
+            delta = target[axis] - self.points[index][axis]
+            near, far = (left, right) if delta < 0 else (right, left)
+            search(near)
+            if abs(delta) <= bound():
+                search(far)
+
+        if k != 0:
+            search(self.root)
+        return [index for _, index in sorted(found, reverse=True)]
+
+
+class RestaurantIndex:
+    '''
+    Restaurants with known coordinates in a KD-tree, the rest are kept aside
+    since a distance can not be calculated for them.
+    '''
+
+    def __init__(self, restaurants):
+        self.restaurants = list(restaurants)
+        self.located_restaurants = [restaurant for restaurant in self.restaurants if restaurant.coordinates]
+        self.unlocated_restaurants = [restaurant for restaurant in self.restaurants if not restaurant.coordinates]
+        self.points = [restaurant.coordinates for restaurant in self.located_restaurants]
+        self.tree = KDTree(self.points)
+
+        zones = {}
+        for restaurant in self.restaurants:
+            if restaurant.delivery_zone is None:
+                continue
+            try:
+                zones[restaurant.id] = parse_zone(restaurant.delivery_zone)
+            except ValueError:
+                logger.warning('Ignoring malformed delivery zone of restaurant %s', restaurant.id, exc_info=True)
+        self.unrestricted_ids = {restaurant.id for restaurant in self.restaurants} - zones.keys()
+        self.zones = ZoneIndex(zones)
+
+    def delivering_ids(self, point):
+        '''
+        Ids of restaurants delivering to the point: those whose zone contains it and those without a zone.
+        '''
+        return self.unrestricted_ids | self.zones.find(point)
+
+    def nearest(self, point, k=None, radius_km=None, eligible_ids=None, known_distances=None):
+        '''
+        Returns (restaurant, distance in km) pairs for the nearest eligible restaurants, nearest first.
+        Distances found in `known_distances` ({restaurant id: km}) are not calculated again.
+        '''
+        accept = None
+        if eligible_ids is not None:
+            accept = lambda index: self.located_restaurants[index].id in eligible_ids  # noqa: E731
+        known_distances = known_distances or {}
+
+        indexes = self.tree.query(point, k, radius_km, accept)
+        unknown_indexes = [
+            index for index in indexes if self.located_restaurants[index].id not in known_distances
+        ]
+        distances = {}
+        if unknown_indexes:
+            distances = dict(zip(
+                unknown_indexes,
+                distance_matrix([point], [self.points[index] for index in unknown_indexes])[0],
+            ))
+        return [
+            (
+                self.located_restaurants[index],
+                known_distances[self.located_restaurants[index].id]
+                if index not in distances else to_km(distances[index]),
+            )
+            for index in indexes
+        ]
+
+
+_restaurant_index = None
+_restaurant_index_built_at = None
+_restaurant_index_lock = threading.Lock()
+
+
+def get_restaurant_index():
+    '''
+    The index is rebuilt when restaurants change in this process
+    and every RESTAURANT_INDEX_TTL seconds to notice changes made by other processes.
+    '''
+    global _restaurant_index, _restaurant_index_built_at
+
+    with _restaurant_index_lock:
+        index_age = time.monotonic() - (_restaurant_index_built_at or 0)
+        if _restaurant_index is not None and index_age < settings.RESTAURANT_INDEX_TTL:
+            return _restaurant_index
+
+        _restaurant_index = RestaurantIndex(Restaurant.objects.order_by('id'))
+        _restaurant_index_built_at = time.monotonic()
+        return _restaurant_index
+
+
+def invalidate_restaurant_index():
+    global _restaurant_index
+    with _restaurant_index_lock:
+        _restaurant_index = None
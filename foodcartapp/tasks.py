@@ -0,0 +1,106 @@
+from .addresses import normalize_address
+from .candidates import get_affected_orders, refresh_candidates
+from .dispatch import dispatch_orders
+from .eligibility import invalidate_eligibility_index
+from .geo_services import geocode_many, get_coordinates_many, link_orders_to_places, refresh_places
+from .jobs import job_handler
+from .models import Order, Place, Restaurant, RestaurantDistance
+from .spatial import invalidate_restaurant_index
+
+
+def refresh_and_dispatch(orders):
+    '''
+    Refresh candidates of open orders and dispatch those nobody could cook before.
+    '''
+    orders = list(orders)
+    refresh_candidates(orders)
+    dispatch_orders(orders)
+
+
+@job_handler('geocode', batch=True)
+def geocode_addresses(payloads):
+    addresses = [payload['address'] for payload in payloads]
+    known_addresses = set(
+        Place.objects
+        .filter(canonical_address__in=[normalize_address(address) for address in addresses])
+        .values_list('canonical_address', flat=True)
+    )
+
+    geocoded = geocode_many(
+        address for address in addresses if normalize_address(address) not in known_addresses
+    )
+    # The job carries one spelling of the address, open orders may use others.
+    canonical_addresses = {normalize_address(address) for address in addresses}
+    unlinked_orders = Order.objects.filter(place=None, status='NEW').exclude(address='').only('id', 'address')
+    linked_orders = link_orders_to_places(
+        order for order in unlinked_orders if normalize_address(order.address) in canonical_addresses
+    )
+    refresh_candidates(linked_orders)
+    dispatch_orders(linked_orders)
+
+    return [
+        None if normalize_address(address) in known_addresses or address in geocoded else 'Геокодер не ответил'
+        for address in addresses
+    ]
+
+
+@job_handler('refresh_place', batch=True)
+def refresh_places_coordinates(payloads):
+    places_ids = [payload['place_id'] for payload in payloads]
+    refreshed_places_ids = refresh_places(Place.objects.filter(id__in=places_ids))
+    existing_places_ids = set(Place.objects.filter(id__in=places_ids).values_list('id', flat=True))
+
+    return [
+        None if place_id in refreshed_places_ids or place_id not in existing_places_ids else 'Геокодер не ответил'
+        for place_id in places_ids
+    ]
+
+
+@job_handler('geocode_restaurant', batch=True)
+def geocode_restaurants(payloads):
+    restaurants = {
+        restaurant.id: restaurant
+        for restaurant in Restaurant.objects.filter(id__in=[payload['restaurant_id'] for payload in payloads])
+    }
+    addresses = {restaurant.address for restaurant in restaurants.values() if restaurant.address}
+    coordinates = get_coordinates_many(addresses)
+    coordinates.update(geocode_many(addresses - coordinates.keys()))
+
+    located_restaurants_ids = []
+    for restaurant in restaurants.values():
+        if not coordinates.get(restaurant.address):
+            continue
+        latitude, longitude = coordinates[restaurant.address]
+        located = (
+            Restaurant.objects
+            .filter(id=restaurant.id, address=restaurant.address)
+            .update(latitude=latitude, longitude=longitude)
+        )
+        if located:
+            located_restaurants_ids.append(restaurant.id)
+    RestaurantDistance.objects.filter(restaurant_id__in=located_restaurants_ids).delete()
+    if located_restaurants_ids:
+        invalidate_restaurant_index()
+        refresh_and_dispatch(get_affected_orders(all_orders=True))
+
+    errors = []
+    for payload in payloads:
+        restaurant = restaurants.get(payload['restaurant_id'])
+        if restaurant and restaurant.address and restaurant.address not in coordinates:
+            errors.append('Геокодер не ответил')
+        else:
+            errors.append(None)
+    return errors
+
+
+@job_handler('refresh_candidates', batch=True)
+def refresh_orders_candidates(payloads):
+    # Menus and restaurants were changed by another process, its signals did not reach the indexes here.
+    invalidate_restaurant_index()
+    invalidate_eligibility_index()
+    refresh_and_dispatch(get_affected_orders(
+        products_ids=[payload['product_id'] for payload in payloads if 'product_id' in payload],
+        places_ids=[payload['place_id'] for payload in payloads if 'place_id' in payload],
+        all_orders=any(payload.get('all_orders') for payload in payloads),
+    ))
+    return [None] * len(payloads)
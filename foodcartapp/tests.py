@@ -0,0 +1,496 @@
+import io
+import itertools
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+import numpy as np
+import requests
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from geopy import distance
+
+from .addresses import normalize_address
+from .changes import ChangeLog
+from .distances import distance_matrix
+from .eligibility import EligibilityIndex
+from .gazetteer import Gazetteer
+from .geo_services import CoordinatesCache, coordinates_cache, geocode_many, request_many_coordinates
+from .geocoder import CircuitBreaker, FakeGeocoder, HedgedGeocoder, YandexGeocoder, get_geocoder
+from .models import GeocoderFailure, Job, OrderChange, Place
+from .routing import nearest_insertion, plan_trips, route_length, two_opt
+from .spatial import KDTree
+from .zones import ZoneIndex, parse_zone
+
+
+class NormalizeAddressTest(SimpleTestCase):
+
+    def test_address_variants_have_same_canonical_form(self):
+        variants = ['ул. Ленина, 5', 'улица Ленина 5', '  УЛ.ЛЕНИНА,  д. 5 ', 'Ул Ленина, дом 5']
+        self.assertEqual({normalize_address(address) for address in variants}, {'улица ленина 5'})
+
+    def test_house_letter_and_building(self):
+        self.assertEqual(normalize_address('пр-т Мира, д. 10 А'), normalize_address('проспект Мира 10а'))
+        self.assertEqual(normalize_address('пр-т Мира, 10к2'), normalize_address('просп. Мира, д. 10, корп. 2'))
+
+
+class PlacesImportExportTest(TestCase):
+
+    def import_places(self, content, file_format):
+        with tempfile.NamedTemporaryFile('w', suffix=f'.{file_format}', encoding='utf-8', delete=False) as file:
+            file.write(content)
+        self.addCleanup(os.remove, file.name)
+        stdout = io.StringIO()
+        call_command('import_places', file.name, stdout=stdout, stderr=io.StringIO())
+        return stdout.getvalue()
+
+    def test_bad_rows_are_skipped(self):
+        output = self.import_places('\n'.join([
+            '{"address": "Ленина, 1", "latitude": 55.75, "longitude": 37.61}',
+            '{"address": "Ленина, 2", "latitude": "NaN", "longitude": 37.61}',
+            '{"address": "Ленина, 3", "latitude": "Infinity", "longitude": 37.61}',
+            '{"address": "Ленина, 4", "latitude": 95, "longitude": 37.61}',
+            '{"address": "Ленина, 5", "latitude": 55.75',
+            '["Ленина, 6", 55.75, 37.61]',
+            '',
+            '{"address": "Ленина, 7", "latitude": "55.76", "longitude": "37.62"}',
+        ]), 'ndjson')
+
+        self.assertIn('пропущено некорректных: 5', output)
+        self.assertEqual(set(Place.objects.values_list('address', flat=True)), {'Ленина, 1', 'Ленина, 7'})
+
+    def test_exported_places_are_imported_back(self):
+        Place.objects.create(address='Ленина, 1', latitude=55.75, longitude=37.61)
+        Place.objects.create(address='Мира, 2', latitude=-33.5, longitude=-70.25)
+
+        for file_format in ['csv', 'ndjson']:
+            exported = io.StringIO()
+            call_command('export_places', format=file_format, stdout=exported, stderr=io.StringIO())
+            places = list(Place.objects.order_by('address').values_list('address', 'latitude', 'longitude'))
+            Place.objects.all().delete()
+
+            output = self.import_places(exported.getvalue(), file_format)
+
+            self.assertIn('пропущено некорректных: 0', output)
+            self.assertEqual(
+                list(Place.objects.order_by('address').values_list('address', 'latitude', 'longitude')), places
+            )
+        self.assertEqual(Place.objects.get(address='Мира, 2').latitude, Decimal('-33.5'))
+
+
+@override_settings(GEOCODER={'BACKEND': 'foodcartapp.geocoder.FakeGeocoder', 'OPTIONS': {'latency': 0}})
+class GeocodeManyTest(TestCase):
+
+    def setUp(self):
+        coordinates_cache.clear()
+        get_geocoder().circuit_breaker.reset()
+
+    def test_spelling_variants_are_requested_once(self):
+        with mock.patch.object(FakeGeocoder, 'geocode', autospec=True, return_value=('55.75', '37.61')) as geocode:
+            geocoded = geocode_many(['ул. Ленина, 5', 'улица Ленина 5', 'Мира, 1'])
+
+        self.assertEqual(geocode.call_count, 2)
+        self.assertEqual(geocoded, {
+            'ул. Ленина, 5': ('55.75', '37.61'), 'улица Ленина 5': ('55.75', '37.61'), 'Мира, 1': ('55.75', '37.61'),
+        })
+        self.assertEqual(Place.objects.count(), 2)
+
+    def test_slow_addresses_are_left_out_without_failure(self):
+        released = threading.Event()
+        self.addCleanup(released.set)
+
+        def geocode(geocoder, address, timeout=None):
+            if address == 'Медленная, 1':
+                released.wait(5)
+            return ('55.75', '37.61')
+
+        with mock.patch.object(FakeGeocoder, 'geocode', autospec=True, side_effect=geocode):
+            geocoded = geocode_many(['Быстрая, 1', 'Медленная, 1'], timeout=0.2)
+
+        self.assertEqual(geocoded, {'Быстрая, 1': ('55.75', '37.61')})
+        self.assertFalse(GeocoderFailure.objects.exists())
+        self.assertEqual(list(Place.objects.values_list('address', flat=True)), ['Быстрая, 1'])
+
+    def test_places_are_saved_with_one_insert(self):
+        with CaptureQueriesContext(connection) as queries:
+            geocoded = geocode_many([f'Ленина, {number}' for number in range(20)])
+
+        self.assertEqual(len(geocoded), 20)
+        inserts = [query['sql'] for query in queries if query['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 1)
+        self.assertIn('foodcartapp_place', inserts[0])
+
+    def test_unexpected_yandex_response_fails_only_its_address(self):
+        geocoder = YandexGeocoder(apikey='key')
+        response = mock.Mock()
+        response.json.return_value = {'response': {'GeoObjectCollection': {
+            'metaDataProperty': {'GeocoderResponseMetaData': {'found': '1'}},
+            'featureMember': [{'GeoObject': {'name': 'Без координат'}}],
+        }}}
+        with mock.patch.object(geocoder.session, 'get', return_value=response):
+            with self.assertRaises(requests.exceptions.RequestException):
+                geocoder.geocode('Ленина, 1')
+
+            with mock.patch('foodcartapp.geo_services.get_geocoder', return_value=geocoder):
+                geocoded, failed_addresses = request_many_coordinates(['Ленина, 1'], timeout=1)
+        self.assertEqual((geocoded, failed_addresses), ({}, ['Ленина, 1']))
+
+
+class DistanceMatrixTest(SimpleTestCase):
+
+    def test_haversine_is_close_to_geodesic(self):
+        rng = random.Random(1)
+        points = [(rng.uniform(55.5, 56), rng.uniform(37.3, 37.9)) for _ in range(30)]
+        matrix = distance_matrix(points[:10], points[10:], exact=False)
+        for row, from_point in enumerate(points[:10]):
+            for column, to_point in enumerate(points[10:]):
+                geodesic_km = distance.distance(from_point, to_point).km
+                self.assertAlmostEqual(matrix[row, column], geodesic_km, delta=geodesic_km * 0.005)
+
+    def test_unknown_points_give_nan(self):
+        for exact in (False, True):
+            matrix = distance_matrix([(55.75, 37.61), None], [None, (55.7, 37.6)], exact=exact)
+            self.assertTrue(np.isnan(matrix[0, 0]) and np.isnan(matrix[1, 0]) and np.isnan(matrix[1, 1]))
+            self.assertFalse(np.isnan(matrix[0, 1]))
+
+    def test_exact_geodesic_is_used_when_enabled(self):
+        from_point, to_point = (55.75, 37.61), (55.7, 37.6)
+        geodesic_km = distance.distance(from_point, to_point).km
+        self.assertEqual(distance_matrix([from_point], [to_point], exact=True)[0, 0], geodesic_km)
+
+        with override_settings(DISTANCE_EXACT_GEODESIC=True):
+            self.assertEqual(distance_matrix([from_point], [to_point])[0, 0], geodesic_km)
+        with override_settings(DISTANCE_EXACT_GEODESIC=False):
+            self.assertNotEqual(distance_matrix([from_point], [to_point])[0, 0], geodesic_km)
+
+
+class CoordinatesCacheTest(SimpleTestCase):
+
+    def test_least_recently_used_address_is_evicted(self):
+        addresses_cache = CoordinatesCache(maxsize=2, ttl=60)
+        addresses_cache.set('Ленина, 1', ('55.7', '37.6'))
+        addresses_cache.set('Ленина, 2', None)
+        self.assertEqual(addresses_cache.get('Ленина, 1'), ('55.7', '37.6'))
+        addresses_cache.set('Ленина, 3', ('55.8', '37.7'))
+
+        self.assertIs(addresses_cache.get('Ленина, 2'), CoordinatesCache.MISSING)
+        self.assertEqual(addresses_cache.get('Ленина, 1'), ('55.7', '37.6'))
+        self.assertEqual(addresses_cache.get('Ленина, 3'), ('55.8', '37.7'))
+
+    def test_entries_expire(self):
+        addresses_cache = CoordinatesCache(maxsize=10, ttl=60)
+        now = time.monotonic()
+        with mock.patch('time.monotonic', return_value=now):
+            addresses_cache.set('Ленина, 1', ('55.7', '37.6'))
+            addresses_cache.set('Ленина, 2', None, ttl=10)
+        with mock.patch('time.monotonic', return_value=now + 30):
+            self.assertEqual(addresses_cache.get('Ленина, 1'), ('55.7', '37.6'))
+            self.assertIs(addresses_cache.get('Ленина, 2'), CoordinatesCache.MISSING)
+        with mock.patch('time.monotonic', return_value=now + 61):
+            self.assertIs(addresses_cache.get('Ленина, 1'), CoordinatesCache.MISSING)
+        self.assertEqual(addresses_cache.get_stats()['size'], 0)
+
+    def test_hits_and_misses_are_counted(self):
+        addresses_cache = CoordinatesCache(maxsize=10, ttl=60)
+        self.assertIsNone(addresses_cache.get_stats()['hit_ratio'])
+        addresses_cache.set('Ленина, 1', ('55.7', '37.6'))
+        addresses_cache.get('Ленина, 1')
+        addresses_cache.get('Ленина, 1')
+        addresses_cache.get('Ленина, 2')
+
+        self.assertEqual(
+            addresses_cache.get_stats(),
+            {'size': 1, 'maxsize': 10, 'hits': 2, 'misses': 1, 'hit_ratio': 0.6667},
+        )
+        addresses_cache.clear()
+        self.assertEqual(addresses_cache.get_stats()['hits'], 0)
+
+
+class FakeGeocoderTest(SimpleTestCase):
+
+    def test_coordinates_are_stable_and_inside_bounds(self):
+        geocoder = FakeGeocoder(latency=0, bounds=((10, 20), (11, 21)))
+        latitude, longitude = geocoder.geocode('Ленина, 1')
+        self.assertTrue(10 <= float(latitude) <= 11 and 20 <= float(longitude) <= 21)
+        self.assertEqual(geocoder.geocode('Ленина, 1'), (latitude, longitude))
+
+    def test_errors_and_unknown_addresses_are_injected(self):
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            FakeGeocoder(latency=0, error_rate=1).geocode('Ленина, 1')
+        self.assertIsNone(FakeGeocoder(latency=0, not_found_rate=1).geocode('Ленина, 1'))
+        with self.assertRaises(requests.exceptions.Timeout):
+            FakeGeocoder(latency=1).geocode('Ленина, 1', timeout=0.01)
+
+
+class HedgedGeocoderTest(SimpleTestCase):
+
+    def make_geocoder(self, *backends_options):
+        backends = [
+            {'BACKEND': 'foodcartapp.geocoder.FakeGeocoder', 'OPTIONS': {'name': f'hedge-test-{number}', **options}}
+            for number, options in enumerate(backends_options)
+        ]
+        geocoder = HedgedGeocoder(backends, name='hedge-test', initial_delay=0.05)
+        for backend in geocoder.backends:
+            backend.circuit_breaker.reset()
+            self.addCleanup(backend.circuit_breaker.reset)
+        return geocoder
+
+    def test_second_backend_answers_when_first_is_slow(self):
+        geocoder = self.make_geocoder(
+            {'latency': 0.5, 'bounds': ((10, 10), (10, 10))},
+            {'latency': 0, 'bounds': ((20, 20), (20, 20))},
+        )
+        started_at = time.monotonic()
+        self.assertEqual(geocoder.geocode('Ленина, 1'), ('20.000000', '20.000000'))
+        self.assertLess(time.monotonic() - started_at, 0.4)
+
+    def test_first_success_wins(self):
+        geocoder = self.make_geocoder(
+            {'latency': 0.1, 'bounds': ((10, 10), (10, 10))},
+            {'latency': 0.5, 'bounds': ((20, 20), (20, 20))},
+        )
+        self.assertEqual(geocoder.geocode('Ленина, 1'), ('10.000000', '10.000000'))
+
+        geocoder = self.make_geocoder(
+            {'latency': 0, 'error_rate': 1, 'bounds': ((10, 10), (10, 10))},
+            {'latency': 0.1, 'bounds': ((20, 20), (20, 20))},
+        )
+        self.assertEqual(geocoder.geocode('Ленина, 1'), ('20.000000', '20.000000'))
+
+    def test_error_is_raised_when_all_backends_fail(self):
+        geocoder = self.make_geocoder({'latency': 0, 'error_rate': 1}, {'latency': 0.1, 'error_rate': 1})
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            geocoder.geocode('Ленина, 1')
+
+        geocoder = self.make_geocoder({'latency': 1}, {'latency': 1})
+        with self.assertRaises(requests.exceptions.Timeout):
+            geocoder.geocode('Ленина, 1', timeout=0.2)
+
+    def test_deadline_is_kept_when_hedge_delay_is_longer(self):
+        geocoder = self.make_geocoder({'latency': 1}, {'latency': 0})
+        geocoder.initial_delay = 5
+        started_at = time.monotonic()
+        with self.assertRaises(requests.exceptions.Timeout):
+            geocoder.geocode('Ленина, 1', timeout=0.2)
+        self.assertLess(time.monotonic() - started_at, 0.5)
+
+
+class RunJobsTest(TestCase):
+
+    def test_old_done_jobs_are_purged(self):
+        now = timezone.now()
+        Job.objects.bulk_create([
+            Job(name='test', key='old', status='DONE', finished_at=now - timedelta(days=2)),
+            Job(name='test', key='recent', status='DONE', finished_at=now - timedelta(hours=1)),
+            Job(name='test', key='failed', status='FAILED', finished_at=now - timedelta(days=2)),
+            Job(name='test', key='waiting', run_after=now + timedelta(days=1)),
+        ])
+
+        stdout = io.StringIO()
+        call_command('run_jobs', once=True, purge_older_than=1, stdout=stdout)
+
+        self.assertEqual(set(Job.objects.values_list('key', flat=True)), {'recent', 'failed', 'waiting'})
+        self.assertIn('Удалено выполненных задач: 1', stdout.getvalue())
+
+
+class CircuitBreakerTest(SimpleTestCase):
+
+    def setUp(self):
+        self.breaker = CircuitBreaker('test', failure_threshold=2, reset_timeout=60)
+        self.breaker.reset()
+        self.addCleanup(self.breaker.reset)
+
+    def test_half_open_circuit_lets_one_request_through(self):
+        self.breaker.record_failure()
+        self.assertTrue(self.breaker.allow_request())
+        self.breaker.record_failure()
+        self.assertTrue(self.breaker.is_open)
+        self.assertFalse(self.breaker.allow_request())
+
+        now = time.time()
+        with mock.patch('time.time', return_value=now + 61):
+            self.assertFalse(self.breaker.is_open)
+            self.assertEqual([self.breaker.allow_request() for _ in range(5)], [True, False, False, False, False])
+            self.breaker.record_failure()
+            self.assertTrue(self.breaker.is_open)
+            self.assertFalse(self.breaker.allow_request())
+
+        with mock.patch('time.time', return_value=now + 122):
+            self.assertTrue(self.breaker.allow_request())
+            self.breaker.record_success()
+            self.assertEqual([self.breaker.allow_request() for _ in range(3)], [True, True, True])
+
+
+class GazetteerTest(SimpleTestCase):
+
+    def setUp(self):
+        self.gazetteer = Gazetteer([
+            ('улица Тверская', '7', '55.7601', '37.6102'),
+            ('ул. Тверская', '12к2', '55.7652', '37.6051'),
+            ('улица Мира', '5', '55.8001', '37.6301'),
+            ('проспект Мира', '5', '55.7801', '37.6331'),
+            ('Ленинский проспект', '30А', '55.7051', '37.5801'),
+        ])
+
+    def test_exact_and_abbreviated_addresses(self):
+        self.assertEqual(self.gazetteer.geocode('г. Москва, ул. Тверская, д. 7, кв. 12'), ('55.7601', '37.6102'))
+        self.assertEqual(self.gazetteer.geocode('Тверская улица 12, корп. 2'), ('55.7652', '37.6051'))
+        self.assertEqual(self.gazetteer.geocode('Ленинский пр-т, 30а'), ('55.7051', '37.5801'))
+
+    def test_street_with_typo(self):
+        self.assertEqual(self.gazetteer.geocode('ул. Тверкая, 7'), ('55.7601', '37.6102'))
+        self.assertEqual(self.gazetteer.geocode('Ленинскй проспект, 30А'), ('55.7051', '37.5801'))
+
+    def test_unknown_and_ambiguous_addresses(self):
+        self.assertIsNone(self.gazetteer.geocode('ул. Тверская, 100'))
+        self.assertIsNone(self.gazetteer.geocode('ул. Арбат, 7'))
+        self.assertIsNone(self.gazetteer.geocode('Мира, 5'))
+        self.assertEqual(self.gazetteer.geocode('пр-т Мира, 5'), ('55.7801', '37.6331'))
+
+
+class ChangeLogTest(TestCase):
+
+    def test_changes_since_event(self):
+        changes = ChangeLog(poll_interval=0.01)
+        start_id = changes.last_event_id
+        self.assertEqual(changes.get_since(start_id, timeout=0), (start_id, []))
+
+        changes.append([1, 2])
+        changes.append([1])
+        first_id = int(start_id) + 1
+        self.assertEqual(changes.get_since(start_id, timeout=0), (str(first_id + 2), [1, 2]))
+        self.assertEqual(changes.get_since(str(first_id + 1), timeout=0), (str(first_id + 2), [1]))
+        self.assertEqual(changes.last_event_id, str(first_id + 2))
+        self.assertIsNone(changes.get_since('3a', timeout=0))
+
+    def test_waits_for_changes_of_other_processes(self):
+        changes = ChangeLog(poll_interval=0.01)
+        start_id = changes.last_event_id
+        started_at = time.monotonic()
+        self.assertEqual(changes.get_since(start_id, timeout=0.05), (start_id, []))
+        self.assertGreaterEqual(time.monotonic() - started_at, 0.05)
+
+        with mock.patch('time.sleep', side_effect=lambda seconds: OrderChange.objects.create(order_id=7)):
+            last_id, orders_ids = changes.get_since(start_id, timeout=10)
+        self.assertEqual(orders_ids, [7])
+
+    def test_readers_of_purged_changes_start_over(self):
+        changes = ChangeLog()
+        changes.append([1, 2, 3])
+        first_id = int(changes.last_event_id) - 2
+        OrderChange.objects.update(changed_at=timezone.now() - timedelta(days=2))
+        changes.append([4])
+
+        self.assertEqual(changes.purge(timedelta(days=1)), 3)
+        self.assertIsNone(changes.get_since(str(first_id), timeout=0))
+        self.assertEqual(changes.get_since(str(first_id + 3), timeout=0), (str(first_id + 3), []))
+
+        OrderChange.objects.update(changed_at=timezone.now() - timedelta(days=2))
+        self.assertEqual(changes.purge(timedelta(days=1)), 0)
+        self.assertEqual(changes.last_event_id, str(first_id + 3))
+
+
+class EligibilityIndexTest(SimpleTestCase):
+
+    def test_masks_follow_menu_changes(self):
+        index = EligibilityIndex([(10, 1, True), (10, 2, True), (20, 1, True), (20, 2, False), (30, 2, True)])
+
+        self.assertEqual(index.eligible_ids([1]), {10, 20})
+        self.assertEqual(index.eligible_ids([1, 2]), {10})
+        self.assertEqual(index.eligible_ids([3]), set())
+        self.assertEqual(index.eligible_ids([]), set())
+
+        index.set_availability(20, 2, True)
+        index.set_availability(10, 1, False)
+        index.set_availability(40, 1, True)
+        self.assertEqual(index.eligible_ids([1, 2]), {20})
+        self.assertEqual(index.eligible_ids([1]), {20, 40})
+
+
+class ZoneIndexTest(SimpleTestCase):
+
+    def test_polygons_with_holes(self):
+        square_with_hole = {
+            'type': 'Polygon',
+            'coordinates': [
+                [[37.5, 55.7], [37.7, 55.7], [37.7, 55.8], [37.5, 55.8], [37.5, 55.7]],
+                [[37.58, 55.74], [37.62, 55.74], [37.62, 55.76], [37.58, 55.76], [37.58, 55.74]],
+            ],
+        }
+        triangles = {
+            'type': 'MultiPolygon',
+            'coordinates': [
+                [[[37.6, 55.9], [37.8, 55.9], [37.7, 56.0]]],
+                [[[37.9, 55.7], [38.1, 55.7], [38.0, 55.8]]],
+            ],
+        }
+        index = ZoneIndex({1: parse_zone(square_with_hole), 2: parse_zone(triangles)})
+
+        self.assertEqual(index.find((55.72, 37.52)), {1})
+        self.assertEqual(index.find((55.75, 37.6)), set())
+        self.assertEqual(index.find((55.92, 37.7)), {2})
+        self.assertEqual(index.find((55.98, 37.62)), set())
+        self.assertEqual(index.find((55.72, 38.0)), {2})
+
+    def test_malformed_zone(self):
+        with self.assertRaises(ValueError):
+            parse_zone({'type': 'Polygon', 'coordinates': [[[37.5, 55.7], [37.7, 55.7]]]})
+        with self.assertRaises(ValueError):
+            parse_zone({'type': 'Point', 'coordinates': [37.5, 55.7]})
+
+
+class KDTreeTest(SimpleTestCase):
+
+    def test_query_matches_full_scan(self):
+        random.seed(1)
+        points = [(55.75 + random.uniform(-0.5, 0.5), 37.62 + random.uniform(-0.5, 0.5)) for _ in range(200)]
+        tree = KDTree(points)
+
+        for _ in range(20):
+            target = (55.75 + random.uniform(-0.5, 0.5), 37.62 + random.uniform(-0.5, 0.5))
+            distances = distance_matrix([target], points, exact=False)[0]
+            eligible = set(random.sample(range(len(points)), 100))
+
+            expected = [
+                index for index in np.argsort(distances)
+                if index in eligible and distances[index] <= 15
+            ][:5]
+            found = tree.query(target, k=5, radius_km=15, accept=eligible.__contains__)
+
+            self.assertEqual(found, expected)
+
+
+class RoutingTest(SimpleTestCase):
+
+    def test_tour_matches_brute_force_on_small_batch(self):
+        random.seed(2)
+        points = [(55.75 + random.uniform(-0.1, 0.1), 37.62 + random.uniform(-0.1, 0.1)) for _ in range(8)]
+        matrix = distance_matrix(points, points, exact=False)
+
+        tour = two_opt(matrix, nearest_insertion(matrix))
+
+        optimal_length = min(
+            route_length(matrix, [0, *permutation, 0]) for permutation in itertools.permutations(range(1, 8))
+        )
+        self.assertEqual(sorted(tour[1:-1]), list(range(1, 8)))
+        self.assertAlmostEqual(route_length(matrix, tour), optimal_length, delta=optimal_length * 0.05)
+
+    def test_trips_respect_capacity_and_serve_every_order(self):
+        random.seed(3)
+        depot = (55.75, 37.62)
+        points = [(55.75 + random.uniform(-0.1, 0.1), 37.62 + random.uniform(-0.1, 0.1)) for _ in range(300)]
+
+        trips = plan_trips(depot, points, capacity=4, time_budget=1)
+
+        self.assertTrue(all(len(trip) <= 4 for trip, _ in trips))
+        self.assertEqual(sorted(index for trip, _ in trips for index in trip), list(range(300)))
+        one_per_order = 2 * distance_matrix([depot], points, exact=False).sum()
+        self.assertLess(sum(trip_length for _, trip_length in trips), one_per_order / 2)
@@ -4,10 +4,13 @@ from django.templatetags.static import static
 from rest_framework import status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
-from rest_framework.serializers import ModelSerializer
+from rest_framework.serializers import ModelSerializer, ValidationError
 
-from .geo_services import geocoding
+from .candidates import refresh_candidates
+from .dispatch import dispatch_orders
+from .geo_services import enqueue_geocoding, get_coordinates, link_orders_to_places
 from .models import Order, OrderProduct, Product
+from .spatial import get_restaurant_index
 
 
 def banners_list_api(request):
@@ -75,6 +78,12 @@ class OrderSerializer(ModelSerializer):
         model = Order
         fields = ['id', 'products', 'firstname', 'lastname', 'phonenumber', 'address']
 
+    def validate_address(self, value):
+        coordinates = get_coordinates(value)
+        if coordinates and not get_restaurant_index().delivering_ids(coordinates):
+            raise ValidationError('Адрес вне зоны доставки ресторанов')
+        return value
+
 
 @transaction.atomic
 @api_view(['POST'])
@@ -101,6 +110,10 @@ def register_order(request):
 
     response = OrderSerializer(order)
 
-    geocoding(serializer.validated_data['address'])
+    if link_orders_to_places([order]):
+        dispatch_orders([order])
+    else:
+        enqueue_geocoding([order.address])
+    refresh_candidates([order])
 
     return Response(response.data, status=status.HTTP_201_CREATED)
@@ -0,0 +1,106 @@
+import math
+from collections import defaultdict
+
+
+def ray_cast(ring, point):
+    '''
+    Even-odd rule: a ray from the point crosses the border of the ring an odd number of times if the point is inside.
+    '''
+    latitude, longitude = point
+    inside = False
+    previous_latitude, previous_longitude = ring[-1]
+    for vertex_latitude, vertex_longitude in ring:
+        if (vertex_latitude > latitude) != (previous_latitude > latitude):
+            crossing_longitude = vertex_longitude + (previous_longitude - vertex_longitude) * (
+                (latitude - vertex_latitude) / (previous_latitude - vertex_latitude)
+            )
+            if longitude < crossing_longitude:
+                inside = not inside
+        previous_latitude, previous_longitude = vertex_latitude, vertex_longitude
+    return inside
+
+
+class Polygon:
+    '''
+    Outer ring of (latitude, longitude) vertices and optional holes.
+    '''
+
+    def __init__(self, rings):
+        self.rings = rings
+        latitudes = [latitude for latitude, _ in rings[0]]
+        longitudes = [longitude for _, longitude in rings[0]]
+        self.bbox = (min(latitudes), min(longitudes), max(latitudes), max(longitudes))
+
+    def contains(self, point):
+        min_latitude, min_longitude, max_latitude, max_longitude = self.bbox
+        latitude, longitude = point
+        if not (min_latitude <= latitude <= max_latitude and min_longitude <= longitude <= max_longitude):
+            return False
+        outer_ring, *holes = self.rings
+        return ray_cast(outer_ring, point) and not any(ray_cast(hole, point) for hole in holes)
+
+
+def parse_zone(geometry):
+    '''
+    Polygons of a GeoJSON Polygon or MultiPolygon geometry, e.g. drawn on geojson.io.
+    GeoJSON puts longitude first. Raises ValueError if the geometry is malformed.
+    '''
+    if not isinstance(geometry, dict) or geometry.get('type') not in {'Polygon', 'MultiPolygon'}:
+        raise ValueError('Ожидается GeoJSON с типом Polygon или MultiPolygon')
+    polygons = geometry.get('coordinates')
+    if geometry['type'] == 'Polygon':
+        polygons = [polygons]
+    if not isinstance(polygons, list) or not polygons:
+        raise ValueError('Не указаны координаты зоны')
+
+    parsed_polygons = []
+    for rings in polygons:
+        if not isinstance(rings, list) or not rings:
+            raise ValueError('Не указаны координаты зоны')
+        parsed_rings = []
+        for ring in rings:
+            try:
+                parsed_ring = [(float(latitude), float(longitude)) for longitude, latitude, *_ in ring]
+            except (TypeError, ValueError):
+                raise ValueError('Вершина зоны должна быть парой чисел [долгота, широта]')
+            if len(parsed_ring) < 3:
+                raise ValueError('В контуре зоны должно быть хотя бы три вершины')
+            parsed_rings.append(parsed_ring)
+        parsed_polygons.append(Polygon(parsed_rings))
+    return parsed_polygons
+
+
+class ZoneIndex:
+    '''
+    Grid of `cell_size` degrees: a point is checked only against polygons
+    whose bounding box overlaps its cell. Polygons larger than `max_cells` cells are always checked.
+    '''
+
+    def __init__(self, zones, cell_size=0.05, max_cells=10000):
+        self.cell_size = cell_size
+        self.cells = defaultdict(list)
+        self.wide_polygons = []
+
+        for zone_id, polygons in zones.items():
+            for polygon in polygons:
+                min_latitude, min_longitude, max_latitude, max_longitude = polygon.bbox
+                min_row, min_column = self.get_cell((min_latitude, min_longitude))
+                max_row, max_column = self.get_cell((max_latitude, max_longitude))
+                if (max_row - min_row + 1) * (max_column - min_column + 1) > max_cells:
+                    self.wide_polygons.append((zone_id, polygon))
+                    continue
+                for row in range(min_row, max_row + 1):
+                    for column in range(min_column, max_column + 1):
+                        self.cells[row, column].append((zone_id, polygon))
+
+    def get_cell(self, point):
+        latitude, longitude = point
+        return math.floor(latitude / self.cell_size), math.floor(longitude / self.cell_size)
+
+    def find(self, point):
+        '''
+        Ids of zones containing the point.
+        '''
+        point = (float(point[0]), float(point[1]))
+        candidates = self.cells.get(self.get_cell(point), []) + self.wide_polygons
+        return {zone_id for zone_id, polygon in candidates if polygon.contains(point)}
@@ -1,3 +1,540 @@
-from django.test import TestCase
+import io
+import json
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.template.loader import render_to_string
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from foodcartapp.addresses import normalize_address
+from foodcartapp.candidates import refresh_candidates
+from foodcartapp.changes import order_changes
+from foodcartapp.geo_services import coordinates_cache
+from foodcartapp.geocoder import build_geocoder, get_geocoder
+from foodcartapp.eligibility import invalidate_eligibility_index
+from foodcartapp.jobs import claim_jobs, run_jobs
+from foodcartapp.load import load_counters
+from foodcartapp.models import (GeocoderFailure, Job, Order, OrderChange, OrderProduct, Place,
+                                Product, Restaurant, RestaurantDistance, RestaurantMenuItem)
+from foodcartapp.spatial import invalidate_restaurant_index
+from restaurateur.views import OrdersFilter
+
+
+@override_settings(GEOCODER={'BACKEND': 'foodcartapp.geocoder.FakeGeocoder'})
+class ViewOrdersTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user('manager', password='manager', is_staff=True)
+        cls.product = Product.objects.create(name='Бургер', price=100, image='burger.jpg')
+        cls.other_product = Product.objects.create(name='Картошка', price=50, image='fries.jpg')
+
+        cls.restaurants = []
+        for number in range(3):
+            Place.objects.create(address=f'Ресторанная, {number}', latitude=55.75 + number / 100, longitude=37.61)
+            restaurant = Restaurant.objects.create(name=f'Ресторан {number}', address=f'Ресторанная, {number}')
+            cls.restaurants.append(restaurant)
+            RestaurantMenuItem.objects.create(restaurant=restaurant, product=cls.product)
+            RestaurantMenuItem.objects.create(
+                restaurant=restaurant, product=cls.other_product, availability=number != 0
+            )
+
+    def setUp(self):
+        cache.clear()
+        coordinates_cache.clear()
+        invalidate_restaurant_index()
+        get_geocoder().circuit_breaker.reset()
+        load_counters.reconcile()
+        invalidate_eligibility_index()
+
+    def create_orders(self, count):
+        first_number = Order.objects.count()
+        for number in range(first_number, first_number + count):
+            place = Place.objects.create(address=f'Клиентская, {number}', latitude=55.7, longitude=37.6 + number / 100)
+            order = Order.objects.create(
+                firstname='Иван', lastname='Иванов', phonenumber='+79001234567', address=place.address, place=place
+            )
+            OrderProduct.objects.create(order=order, product=self.product, quantity=1, price=100)
+            OrderProduct.objects.create(order=order, product=self.other_product, quantity=2, price=50)
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('restaurateur:view_orders'))
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+    def test_queries_count_does_not_depend_on_orders_count(self):
+        self.client.force_login(self.manager)
+        self.create_orders(1)
+        self.count_queries()
+
+        self.create_orders(1)
+        queries_for_one_order, _ = self.count_queries()
+
+        self.create_orders(20)
+        queries_for_many_orders, _ = self.count_queries()
+
+        self.assertEqual(queries_for_one_order, queries_for_many_orders)
+
+    @override_settings(ORDERS_PAGE_SIZE=2)
+    def test_orders_are_filtered_and_paginated(self):
+        self.client.force_login(self.manager)
+        self.create_orders(5)
+        registrated_at = timezone.now() - timedelta(days=1)
+        Order.objects.filter(id__in=Order.objects.order_by('id').values('id')[:3]).update(registrated_at=registrated_at)
+        Order.objects.filter(id=Order.objects.order_by('id')[1].id).update(status='COMPLETED', payment_method='CASH')
+        orders_ids = list(Order.objects.order_by('registrated_at', 'id').values_list('id', 'status'))
+
+        pages = []
+        url = reverse('restaurateur:view_orders')
+        while url:
+            response = self.client.get(url)
+            pages.append([order.id for order in response.context['orders']])
+            url = response.context['next_page_url']
+        self.assertEqual(pages, [
+            [order_id for order_id, status in orders_ids if status == 'NEW'][:2],
+            [order_id for order_id, status in orders_ids if status == 'NEW'][2:],
+        ])
+
+        response = self.client.get(reverse('restaurateur:view_orders'), {
+            'status': ['NEW', 'COMPLETED'],
+            'payment_method': 'CASH',
+            'registrated_to': registrated_at.date().isoformat(),
+        })
+        self.assertEqual([order.id for order in response.context['orders']], [orders_ids[1][0]])
+
+        for after in ['вчера_1', '2024-13-45T00:00:00_5']:
+            response = self.client.get(reverse('restaurateur:view_orders'), {'status': 'NEW', 'after': after})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.context['orders']), 2)
+            self.assertContains(response, 'Некорректная ссылка на страницу')
+
+            response = self.client.get(reverse('restaurateur:orders_feed'), {'status': 'NEW', 'after': after})
+            self.assertEqual(response.status_code, 200)
+
+        naive_cursor = f'{registrated_at.replace(tzinfo=None).isoformat()}_{orders_ids[0][0]}'
+        filter_form = OrdersFilter({'after': naive_cursor})
+        self.assertTrue(filter_form.is_valid())
+        self.assertEqual(filter_form.cleaned_data['after'], (registrated_at, orders_ids[0][0]))
+
+    def test_restaurants_without_products_are_excluded(self):
+        self.client.force_login(self.manager)
+        self.create_orders(1)
+
+        _, response = self.count_queries()
+
+        order = response.context['orders'][0]
+        restaurants = [restaurant.name for restaurant, *_ in order.restaurants]
+        self.assertEqual(restaurants, ['Ресторан 1', 'Ресторан 2'])
+        self.assertTrue(all(distance is not None for restaurant, distance, pending in order.restaurants))
+
+    def test_restaurants_not_stocking_product_are_excluded(self):
+        self.client.force_login(self.manager)
+        self.create_orders(1)
+        RestaurantMenuItem.objects.filter(restaurant=self.restaurants[2], product=self.product).delete()
+
+        _, response = self.count_queries()
+        order = response.context['orders'][0]
+        self.assertEqual([restaurant.name for restaurant, *_ in order.restaurants], ['Ресторан 1'])
+
+        menu_item = RestaurantMenuItem.objects.get(restaurant=self.restaurants[1], product=self.other_product)
+        menu_item.availability = False
+        menu_item.save()
+        self.assertTrue(all(done for _, done in run_jobs(claim_jobs(10))))
+
+        _, response = self.count_queries()
+        self.assertContains(response, 'Нет подходящих ресторанов')
+
+    def test_restaurants_outside_delivery_zone_are_excluded(self):
+        self.client.force_login(self.manager)
+        self.create_orders(1)
+        far_zone = {
+            'type': 'Polygon',
+            'coordinates': [[[38.0, 56.0], [38.2, 56.0], [38.2, 56.2], [38.0, 56.2], [38.0, 56.0]]],
+        }
+        Restaurant.objects.filter(name='Ресторан 1').update(delivery_zone=far_zone)
+        invalidate_restaurant_index()
+
+        _, response = self.count_queries()
+
+        order = response.context['orders'][0]
+        self.assertEqual([restaurant.name for restaurant, *_ in order.restaurants], ['Ресторан 2'])
+
+        order_data = {
+            'firstname': 'Иван', 'lastname': 'Иванов', 'phonenumber': '+79001234567', 'address': 'Клиентская, 0',
+            'products': [{'product': self.product.id, 'quantity': 1}],
+        }
+
+        response = self.client.post('/api/order/', order_data, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+
+        Restaurant.objects.update(delivery_zone=far_zone)
+        invalidate_restaurant_index()
+        response = self.client.post('/api/order/', order_data, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('address', response.json())
+
+    def test_unknown_addresses_are_queued_for_geocoding(self):
+        self.client.force_login(self.manager)
+        order = Order.objects.create(
+            firstname='Иван', lastname='Иванов', phonenumber='+79001234567', address='Неизвестная, 1'
+        )
+        OrderProduct.objects.create(order=order, product=self.product, quantity=1, price=100)
+
+        _, response = self.count_queries()
+        self.count_queries()
+
+        self.assertEqual(Job.objects.filter(name='geocode', key=normalize_address(order.address)).count(), 1)
+        order = response.context['orders'][0]
+        self.assertTrue(all(pending for restaurant, distance, pending in order.restaurants))
+        self.assertContains(response, 'расстояние вычисляется')
+
+    def test_orders_are_linked_to_places_and_dispatched(self):
+        self.client.force_login(self.manager)
+        self.create_orders(1)
+        known_order, unknown_order, respelled_order = [
+            Order.objects.create(firstname='Иван', lastname='Иванов', phonenumber='+79001234567', address=address)
+            for address in ['клиентская,  д. 0', 'Неизвестная, 1', 'неизвестная  1']
+        ]
+        for order in [known_order, unknown_order, respelled_order]:
+            OrderProduct.objects.create(order=order, product=self.product, quantity=1, price=100)
+
+        self.count_queries()
+        self.assertEqual(Job.objects.filter(name='geocode', key=normalize_address(unknown_order.address)).count(), 1)
+        self.assertFalse(
+            Order.objects.filter(id__in=[known_order.id, unknown_order.id, respelled_order.id]).exclude(place=None).exists()
+        )
+        self.assertFalse(Order.objects.exclude(restaurant=None).exists())
+
+        self.assertTrue(all(done for _, done in run_jobs(claim_jobs(10))))
+        known_order.refresh_from_db()
+        self.assertEqual(known_order.place.address, 'Клиентская, 0')
+        self.assertEqual(known_order.restaurant.name, 'Ресторан 0')
+        for order in [unknown_order, respelled_order]:
+            order.refresh_from_db()
+            self.assertEqual(order.place.canonical_address, normalize_address(unknown_order.address))
+            self.assertIsNotNone(order.restaurant)
+
+    def test_orders_are_dispatched_when_restaurant_becomes_eligible(self):
+        RestaurantMenuItem.objects.filter(product=self.other_product).update(availability=False)
+        invalidate_eligibility_index()
+        Place.objects.create(address='Клиентская, 100', latitude=55.7, longitude=37.6)
+        order_data = {
+            'firstname': 'Иван', 'lastname': 'Иванов', 'phonenumber': '+79001234567', 'address': 'Клиентская, 100',
+            'products': [{'product': self.other_product.id, 'quantity': 1}],
+        }
+        response = self.client.post('/api/order/', order_data, content_type='application/json')
+        order = Order.objects.get(id=response.json()['id'])
+        self.assertIsNone(order.restaurant)
+
+        menu_item = RestaurantMenuItem.objects.get(restaurant=self.restaurants[1], product=self.other_product)
+        menu_item.availability = True
+        menu_item.save()
+        self.assertTrue(all(done for _, done in run_jobs(claim_jobs(10))))
+
+        order.refresh_from_db()
+        self.assertEqual(order.restaurant, self.restaurants[1])
+
+    def test_dispatch_prefers_less_loaded_restaurant(self):
+        Place.objects.create(address='Клиентская, 100', latitude=55.7, longitude=37.6)
+        order_data = {
+            'firstname': 'Иван', 'lastname': 'Иванов', 'phonenumber': '+79001234567', 'address': 'Клиентская, 100',
+            'products': [{'product': self.product.id, 'quantity': 1}, {'product': self.other_product.id, 'quantity': 1}],
+        }
+
+        restaurants = []
+        for _ in range(3):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post('/api/order/', order_data, content_type='application/json')
+            self.assertEqual(response.status_code, 201)
+            restaurants.append(Order.objects.get(id=response.json()['id']).restaurant.name)
+
+        self.assertEqual(restaurants, ['Ресторан 1', 'Ресторан 1', 'Ресторан 2'])
+        self.assertEqual(load_counters.get(), {self.restaurants[1].id: 2, self.restaurants[2].id: 1})
+
+        order = Order.objects.filter(restaurant=self.restaurants[1]).first()
+        order.status = 'COMPLETED'
+        with self.captureOnCommitCallbacks(execute=True):
+            order.save()
+        self.assertEqual(load_counters.get(), {self.restaurants[1].id: 1, self.restaurants[2].id: 1})
+
+        Order.objects.filter(restaurant=self.restaurants[2]).update(restaurant=self.restaurants[1])
+        load_counters.reconcile()
+        self.assertEqual(load_counters.get(), {self.restaurants[1].id: 2})
+
+    def test_candidates_are_saved_on_write(self):
+        self.client.force_login(self.manager)
+        Place.objects.create(address='Клиентская, 100', latitude=55.7, longitude=37.6)
+        order_data = {
+            'firstname': 'Иван', 'lastname': 'Иванов', 'phonenumber': '+79001234567', 'address': 'Клиентская, 100',
+            'products': [{'product': self.other_product.id, 'quantity': 1}],
+        }
+        response = self.client.post('/api/order/', order_data, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        order = Order.objects.get(id=response.json()['id'])
+        self.assertEqual(
+            [candidate.restaurant.name for candidate in order.candidates.order_by('distance')],
+            ['Ресторан 1', 'Ресторан 2'],
+        )
+
+        with mock.patch('foodcartapp.candidates.calculate_candidates') as calculate_candidates:
+            _, response = self.count_queries()
+        calculate_candidates.assert_not_called()
+        self.assertEqual(len(response.context['orders'][0].restaurants), 2)
+
+        RestaurantMenuItem.objects.filter(restaurant=self.restaurants[0], product=self.other_product).update(
+            availability=True
+        )
+        RestaurantMenuItem.objects.get(restaurant=self.restaurants[1], product=self.other_product).delete()
+        self.assertTrue(Job.objects.filter(name='refresh_candidates', key=f'product:{self.other_product.id}').exists())
+        self.assertTrue(all(done for _, done in run_jobs(claim_jobs(10))))
+        self.assertEqual(
+            [candidate.restaurant.name for candidate in order.candidates.order_by('distance')],
+            ['Ресторан 0', 'Ресторан 2'],
+        )
+
+    def test_orders_feed_sends_changed_rows(self):
+        self.client.force_login(self.manager)
+        self.create_orders(1)
+        response = self.client.get(reverse('restaurateur:view_orders'))
+        feed_url = response.context['feed_url']
+
+        Place.objects.create(address='Клиентская, 100', latitude=55.7, longitude=37.6)
+        order_data = {
+            'firstname': 'Пётр', 'lastname': 'Петров', 'phonenumber': '+79001234567', 'address': 'Клиентская, 100',
+            'products': [{'product': self.product.id, 'quantity': 1}],
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            order_id = self.client.post('/api/order/', order_data, content_type='application/json').json()['id']
+        with self.captureOnCommitCallbacks(execute=True):
+            Order.objects.filter(id=order_id).update(status='COMPLETED')
+            Order.objects.get(id=order_id).save()
+
+        response = self.client.get(feed_url)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = iter(response.streaming_content)
+        self.assertEqual(next(events), b'retry: 3000\n\n')
+        event_id, event, data = next(events).decode().strip().splitlines()
+        self.assertEqual(event, 'event: order')
+        self.assertEqual(json.loads(data.split(': ', 1)[1]), {'id': order_id, 'html': None})
+
+        response = self.client.get(feed_url.replace('status=NEW', 'status=COMPLETED'))
+        events = iter(response.streaming_content)
+        next(events)
+        event_id, event, data = next(events).decode().strip().splitlines()
+        self.assertIn('Пётр Петров', json.loads(data.split(': ', 1)[1])['html'])
+
+        response = self.client.get(feed_url, HTTP_LAST_EVENT_ID=event_id.split(': ', 1)[1])
+        with override_settings(ORDERS_FEED_TIMEOUT=0):
+            self.assertEqual(list(response.streaming_content), [b'retry: 3000\n\n'])
+
+        OrderChange.objects.update(changed_at=timezone.now() - timedelta(days=2))
+        last_event_id = event_id.split(': ', 1)[1]
+        with self.captureOnCommitCallbacks(execute=True):
+            Order.objects.get(id=order_id).save()
+        order_changes.purge(timedelta(days=1))
+        response = self.client.get(feed_url, HTTP_LAST_EVENT_ID=last_event_id)
+        self.assertEqual(list(response.streaming_content), [b'retry: 3000\n\n', b'event: reload\ndata: {}\n\n'])
+
+    def test_orders_feed_sends_changes_made_by_job_worker(self):
+        self.client.force_login(self.manager)
+        order = Order.objects.create(
+            firstname='Иван', lastname='Иванов', phonenumber='+79001234567', address='Неизвестная, 1'
+        )
+        OrderProduct.objects.create(order=order, product=self.product, quantity=1, price=100)
+        response = self.client.get(reverse('restaurateur:view_orders'))
+        feed_url = response.context['feed_url']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(all(done for _, done in run_jobs(claim_jobs(10))))
+
+        response = self.client.get(feed_url)
+        events = iter(response.streaming_content)
+        next(events)
+        event_id, event, data = next(events).decode().strip().splitlines()
+        self.assertEqual(json.loads(data.split(': ', 1)[1])['id'], order.id)
+        self.assertNotIn('расстояние вычисляется', json.loads(data.split(': ', 1)[1])['html'])
+
+    def test_only_moved_restaurants_outdate_candidates(self):
+        self.create_orders(1)
+        restaurant = Restaurant.objects.get(name='Ресторан 1')
+        restaurant.name = 'Ресторан на углу'
+        restaurant.contact_phone = '+79000000000'
+        restaurant.save()
+        self.assertFalse(Job.objects.filter(name='refresh_candidates').exists())
+
+        restaurant.delivery_zone = {
+            'type': 'Polygon',
+            'coordinates': [[[38.0, 56.0], [38.2, 56.0], [38.2, 56.2], [38.0, 56.2], [38.0, 56.0]]],
+        }
+        restaurant.save()
+        self.assertTrue(Job.objects.filter(name='refresh_candidates', key='all').exists())
+
+    def test_failed_addresses_are_not_queued_again(self):
+
+        self.client.force_login(self.manager)
+        order = Order.objects.create(
+            firstname='Иван', lastname='Иванов', phonenumber='+79001234567', address='Несуществующая, 1'
+        )
+        OrderProduct.objects.create(order=order, product=self.product, quantity=1, price=100)
+        GeocoderFailure.objects.create(
+            address=normalize_address(order.address), reason='NOT_FOUND', expires_at=timezone.now() + timedelta(days=1)
+        )
+
+        _, response = self.count_queries()
+
+        self.assertFalse(Job.objects.exists())
+        self.assertContains(response, 'расстояние неизвестно')
+
+    def test_stale_places_are_served_and_queued_for_refresh(self):
+        self.client.force_login(self.manager)
+        self.create_orders(1)
+        Place.objects.filter(address='Клиентская, 0').update(
+            request_to_geocoder_at=timezone.now() - timedelta(days=365)
+        )
+
+        _, response = self.count_queries()
+
+        order = response.context['orders'][0]
+        self.assertTrue(all(distance is not None for restaurant, distance, pending in order.restaurants))
+        self.assertEqual(Job.objects.filter(name='refresh_place', key='клиентская 0').count(), 1)
+
+    def test_refreshed_places_update_candidates(self):
+        self.create_orders(1)
+        order = Order.objects.select_related('place').get()
+        refresh_candidates([order])
+        old_distances = dict(order.candidates.values_list('restaurant_id', 'distance'))
+        Place.objects.filter(id=order.place_id).update(request_to_geocoder_at=timezone.now() - timedelta(days=365))
+
+        with mock.patch('time.sleep'):
+            call_command('refresh_places', max_age_days=1, stdout=io.StringIO())
+        self.assertTrue(Job.objects.filter(name='refresh_candidates', key=f'place:{order.place_id}').exists())
+
+        self.assertTrue(all(done for _, done in run_jobs(claim_jobs(10))))
+        new_distances = dict(order.candidates.values_list('restaurant_id', 'distance'))
+        self.assertEqual(new_distances.keys(), old_distances.keys())
+        self.assertNotEqual(new_distances, old_distances)
+
+    def test_merged_places_update_candidates(self):
+        self.create_orders(1)
+        kept_place = Place.objects.get(address='Клиентская, 0')
+        duplicate = Place.objects.create(
+            address='клиентская,  д. 0', latitude=55.8, longitude=37.7,
+            request_to_geocoder_at=timezone.now() - timedelta(days=1),
+        )
+        Order.objects.update(place=duplicate)
+
+        call_command('merge_duplicate_places', stdout=io.StringIO())
+
+        self.assertEqual(Order.objects.get().place, kept_place)
+        self.assertTrue(Job.objects.filter(name='refresh_candidates', key=f'place:{kept_place.id}').exists())
+
+    def test_open_circuit_renders_unknown_distance(self):
+        self.client.force_login(self.manager)
+        order = Order.objects.create(
+            firstname='Иван', lastname='Иванов', phonenumber='+79001234567', address='Неизвестная, 1'
+        )
+        OrderProduct.objects.create(order=order, product=self.product, quantity=1, price=100)
+        # Failures are recorded by the job worker, another process with its own geocoder.
+        self.assertNotIn('locmem', settings.CACHES['default']['BACKEND'])
+        worker_geocoder = build_geocoder(settings.GEOCODER)
+        for _ in range(settings.GEOCODER_FAILURE_THRESHOLD):
+            worker_geocoder.circuit_breaker.record_failure()
+
+        _, response = self.count_queries()
+
+        self.assertContains(response, 'Геокодер временно недоступен')
+        self.assertContains(response, 'расстояние неизвестно')
+        self.assertNotContains(response, 'расстояние вычисляется')
+
+    def test_known_distances_are_not_calculated_again(self):
+        self.client.force_login(self.manager)
+        self.create_orders(3)
+
+        _, first_response = self.count_queries()
+        self.assertEqual(RestaurantDistance.objects.count(), 6)
+
+        with mock.patch('foodcartapp.spatial.distance_matrix') as distance_matrix:
+            _, second_response = self.count_queries()
+        distance_matrix.assert_not_called()
+
+        self.assertEqual(
+            [order.row for order in first_response.context['orders']],
+            [order.row for order in second_response.context['orders']],
+        )
+
+    def test_only_changed_rows_are_rendered(self):
+        self.client.force_login(self.manager)
+        self.create_orders(3)
+        self.count_queries()
+
+        order = Order.objects.first()
+        order.comment = 'Позвонить за час'
+        order.save()
+        with mock.patch('restaurateur.views.render_to_string', wraps=render_to_string) as render_row:
+            _, response = self.count_queries()
+        self.assertEqual(render_row.call_count, 1)
+        self.assertContains(response, 'Позвонить за час')
+
+        restaurant = self.restaurants[1]
+        restaurant.name = 'Ресторан на углу'
+        restaurant.save()
+        with mock.patch('restaurateur.views.render_to_string', wraps=render_to_string) as render_row:
+            _, response = self.count_queries()
+        self.assertEqual(render_row.call_count, 3)
+        self.assertContains(response, 'Ресторан на углу')
+
+    def test_distances_are_forgotten_when_restaurant_moves(self):
+        self.client.force_login(self.manager)
+        self.create_orders(1)
+        self.count_queries()
+
+        restaurant = Restaurant.objects.get(name='Ресторан 1')
+        restaurant.address = 'Новая, 1'
+        restaurant.save()
+
+        self.assertFalse(RestaurantDistance.objects.filter(restaurant=restaurant).exists())
+        self.assertTrue(RestaurantDistance.objects.exists())
+        self.assertIsNone(restaurant.coordinates)
+
+    def test_moved_restaurant_is_geocoded_in_background(self):
+        self.client.force_login(self.manager)
+        self.create_orders(1)
+        restaurant = Restaurant.objects.get(name='Ресторан 1')
+        restaurant.address = 'Новая, 1'
+        restaurant.save()
+
+        _, response = self.count_queries()
+        order = response.context['orders'][0]
+        self.assertIn((restaurant, None, True), order.restaurants)
+
+        self.assertTrue(all(done for _, done in run_jobs(claim_jobs(10))))
+        restaurant.refresh_from_db()
+        self.assertIsNotNone(restaurant.coordinates)
+
+        invalidate_restaurant_index()
+        _, response = self.count_queries()
+        order = response.context['orders'][0]
+        self.assertTrue(all(distance is not None for restaurant, distance, pending in order.restaurants))
+
+    def test_geocoder_cache_stats_are_shown_to_managers(self):
+        url = reverse('restaurateur:geocoder_cache_stats')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 302)
+
+        self.client.force_login(self.manager)
+        coordinates_cache.set('Ленина, 1', ('55.7', '37.6'))
+        coordinates_cache.get('Ленина, 1')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            'size': 1, 'maxsize': settings.GEOCODER_CACHE_SIZE, 'hits': 1, 'misses': 0, 'hit_ratio': 1.0,
+        })
@@ -14,6 +14,9 @@ urlpatterns = [
 
     # TODO заглушка для нереализованного функционала
     path('orders/', views.view_orders, name="view_orders"),
+    path('orders/feed/', views.view_orders_feed, name="orders_feed"),
+
+    path('geocoder-cache/', views.view_geocoder_cache_stats, name="geocoder_cache_stats"),
 
     path('login/', views.LoginView.as_view(), name="login"),
     path('logout/', views.LogoutView.as_view(), name="logout"),
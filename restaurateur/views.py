@@ -1,13 +1,33 @@
+import hashlib
+import json
+from datetime import datetime, time, timedelta
+from time import monotonic
+
 from django import forms
+from django.conf import settings
 from django.contrib.auth import authenticate, login
 from django.contrib.auth import views as auth_views
 from django.contrib.auth.decorators import user_passes_test
+from django.core.cache import cache
+from django.db.models import F, Prefetch, Q, prefetch_related_objects
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import redirect, render
-from django.urls import reverse_lazy
+from django.template.loader import render_to_string
+from django.urls import reverse, reverse_lazy
+from django.utils.dateparse import parse_datetime
+from django.utils.safestring import mark_safe
+from django.utils.timezone import is_naive, make_aware
 from django.views import View
 
-from foodcartapp.geo_services import calculate_distance
-from foodcartapp.models import Order, Product, Restaurant, RestaurantMenuItem
+from foodcartapp.candidates import refresh_candidates
+from foodcartapp.changes import get_restaurants_version, order_changes
+from foodcartapp.geo_services import (coordinates_cache, enqueue_geocoding, enqueue_stale_places_refresh,
+                                      get_coordinates_many, get_pending_restaurants_ids, is_geocoder_available)
+from foodcartapp.load import load_counters
+from foodcartapp.models import Order, OrderCandidate, Product, Restaurant
+from foodcartapp.spatial import get_restaurant_index
+
+OPEN_ORDER_STATUSES = ['NEW']
 
 
 class Login(forms.Form):
@@ -27,6 +47,64 @@ class Login(forms.Form):
     )
 
 
+class OrdersFilter(forms.Form):
+    status = forms.MultipleChoiceField(
+        label='Статус', required=False, choices=Order.ORDER_STATUS_CHOICES,
+        widget=forms.CheckboxSelectMultiple,
+    )
+    payment_method = forms.ChoiceField(
+        label='Способ оплаты', required=False, choices=[('', 'Любой'), *Order.PAYMENT_METHOD_CHOICES],
+        widget=forms.Select(attrs={'class': 'form-control'}),
+    )
+    registrated_from = forms.DateField(
+        label='Зарегистрирован с', required=False,
+        widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}),
+    )
+    registrated_to = forms.DateField(
+        label='по', required=False,
+        widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}),
+    )
+    after = forms.CharField(required=False, widget=forms.HiddenInput)
+
+    def clean_after(self):
+        '''
+        Cursor of the last order on the previous page: "<registrated_at in ISO format>_<id>".
+        A time without an offset is taken in the current time zone.
+        '''
+        after = self.cleaned_data['after']
+        if not after:
+            return None
+        registrated_at, _, order_id = after.rpartition('_')
+        try:
+            registrated_at = parse_datetime(registrated_at) if registrated_at else None
+        except ValueError:
+            registrated_at = None
+        if registrated_at is None or not order_id.isdigit():
+            raise forms.ValidationError('Некорректная ссылка на страницу')
+        if is_naive(registrated_at):
+            registrated_at = make_aware(registrated_at)
+        return registrated_at, int(order_id)
+
+
+def filter_orders(orders, status=(), payment_method='', registrated_from=None, registrated_to=None, after=None):
+    '''
+    Orders are paginated by the (registrated_at, id) cursor, so a page costs the same however long the history is.
+    '''
+    if status:
+        orders = orders.filter(status__in=status)
+    if payment_method:
+        orders = orders.filter(payment_method=payment_method)
+    if registrated_from:
+        orders = orders.filter(registrated_at__gte=make_aware(datetime.combine(registrated_from, time.min)))
+    if registrated_to:
+        next_day = registrated_to + timedelta(days=1)
+        orders = orders.filter(registrated_at__lt=make_aware(datetime.combine(next_day, time.min)))
+    if after:
+        registrated_at, order_id = after
+        orders = orders.filter(Q(registrated_at__gt=registrated_at) | Q(registrated_at=registrated_at, id__gt=order_id))
+    return orders.order_by('registrated_at', 'id')
+
+
 class LoginView(View):
     def get(self, request, *args, **kwargs):
         form = Login()
@@ -94,25 +172,184 @@ def view_restaurants(request):
     })
 
 
+def prepare_orders(orders):
+    '''
+    Queue geocoding of orders without a place and refresh outdated candidate restaurants.
+    Orders are linked to places and dispatched by the worker, not by opening the page.
+    Returns whether the geocoder is available, addresses and ids of restaurants waiting for it.
+    '''
+    restaurant_index = get_restaurant_index()
+
+    unlinked_addresses = {order.address for order in orders if not order.place}
+    coordinates = get_coordinates_many(unlinked_addresses)
+    pending_addresses = enqueue_geocoding({
+        address for address in unlinked_addresses if coordinates.get(address, True) is not None
+    })
+    enqueue_stale_places_refresh({order.place_id: order.place for order in orders if order.place}.values())
+    pending_restaurants_ids = get_pending_restaurants_ids(restaurant_index.unlocated_restaurants)
+    geocoder_available = is_geocoder_available()
+    if not geocoder_available:
+        pending_addresses = pending_restaurants_ids = set()
+
+    refresh_candidates(order for order in orders if order.candidates_updated_at is None)
+    return geocoder_available, pending_addresses, pending_restaurants_ids
+
+
+def attach_candidates(orders, pending_addresses, pending_restaurants_ids):
+    '''
+    Candidate restaurants of every order as `order.restaurants`: (restaurant, km, whether the distance is pending).
+    '''
+    prefetch_related_objects(orders, Prefetch(
+        'candidates',
+        queryset=OrderCandidate.objects.select_related('restaurant').order_by(
+            F('distance').asc(nulls_last=True), 'restaurant_id'
+        ),
+    ))
+
+    for order in orders:
+        order.restaurants = [
+            (
+                candidate.restaurant,
+                candidate.distance,
+                candidate.distance is None and (
+                    order.address in pending_addresses or candidate.restaurant_id in pending_restaurants_ids
+                ),
+            )
+            for candidate in order.candidates.all()
+        ]
+
+
+def get_order_row_key(order, *versions):
+    '''
+    The key changes with any field shown in the row. Candidates are versioned by the time they were saved,
+    so a menu change outdates rows of affected orders only, once their candidates are refreshed.
+    '''
+    order_version = (
+        order.id, order.status, order.payment_method, order.price, order.firstname, order.lastname,
+        str(order.phonenumber), order.address, order.comment, order.restaurant_id, order.candidates_updated_at,
+    )
+    return 'order_row:' + hashlib.md5(repr((order_version, *versions)).encode()).hexdigest()
+
+
+def render_order_rows(orders, orders_url):
+    '''
+    Table rows of orders as `order.row`. Rows are cached, only rows of changed orders are rendered again.
+    Returns whether the geocoder is available.
+    '''
+    geocoder_available, pending_addresses, pending_restaurants_ids = prepare_orders(orders)
+    page_version = (get_restaurants_version(), geocoder_available, sorted(pending_restaurants_ids), orders_url)
+    keys = {
+        order.id: get_order_row_key(order, order.address in pending_addresses, page_version) for order in orders
+    }
+    rows = cache.get_many(keys.values())
+
+    outdated_orders = [order for order in orders if keys[order.id] not in rows]
+    attach_candidates(outdated_orders, pending_addresses, pending_restaurants_ids)
+    rendered_rows = {
+        keys[order.id]: render_to_string('order_row.html', {'order': order, 'orders_url': orders_url})
+        for order in outdated_orders
+    }
+    cache.set_many(rendered_rows, timeout=settings.ORDER_ROW_CACHE_TIMEOUT)
+    rows.update(rendered_rows)
+
+    for order in orders:
+        order.row = mark_safe(rows[keys[order.id]])
+    return geocoder_available
+
+
 @user_passes_test(is_manager, login_url='restaurateur:login')
 def view_orders(request):
-    orders = Order.objects.calculate_order_price()
-    unavailability_products = list(RestaurantMenuItem.objects.filter(availability=False).values_list('restaurant_id', 'product_id'))
+    query = request.GET.copy()
+    if not query:
+        query.setlist('status', OPEN_ORDER_STATUSES)
+    filter_form = OrdersFilter(query)
+    filter_form.is_valid()
+    orders = list(
+        filter_orders(Order.objects.all(), **filter_form.cleaned_data)
+        .calculate_order_price()
+        .select_related('place', 'restaurant')[:settings.ORDERS_PAGE_SIZE + 1]
+    )
+    first_page_url = next_page_url = None
+    if query.get('after'):
+        first_page_query = query.copy()
+        del first_page_query['after']
+        first_page_url = f'{request.path}?{first_page_query.urlencode()}'
+    if len(orders) > settings.ORDERS_PAGE_SIZE:
+        orders = orders[:settings.ORDERS_PAGE_SIZE]
+        query['after'] = f'{orders[-1].registrated_at.isoformat()}_{orders[-1].id}'
+        next_page_url = f'{request.path}?{query.urlencode()}'
 
-    for order in orders:
-        order_products_ids = order.items.values_list('product_id', flat=True)
+    feed_query = query.copy()
+    feed_query.pop('after', None)
+    feed_query['last_event_id'] = order_changes.last_event_id
+    restaurant_index = get_restaurant_index()
+    geocoder_available = render_order_rows(orders, request.get_full_path())
 
-        inappropriate_restaurants_ids = [
-            restaurant for restaurant, product in unavailability_products if product in order_products_ids
-        ]
+    restaurants_load = load_counters.get()
+
+    return render(request, template_name='order_items.html', context={
+        'orders': orders,
+        'filter_form': filter_form,
+        'first_page_url': first_page_url,
+        'next_page_url': next_page_url,
+        'geocoder_available': geocoder_available,
+        'feed_url': f"{reverse('restaurateur:orders_feed')}?{feed_query.urlencode()}",
+        'restaurants_load': [
+            (restaurant, restaurants_load.get(restaurant.id, 0)) for restaurant in restaurant_index.restaurants
+        ],
+    })
 
-        appropriate_restaurants = Restaurant.objects.exclude(id__in=inappropriate_restaurants_ids)
 
-        for restaurant in appropriate_restaurants:
-            restaurant.distance = calculate_distance(restaurant.address, order.address)
+def stream_orders_changes(filters, last_event_id, orders_url):
+    '''
+    Server-sent events: `order` with the rendered row of a new or changed order, or without it
+    if the order no longer matches the filters; `reload` if the page missed changes and has to be reloaded.
+    '''
+    yield 'retry: 3000\n\n'
+    stream_until = monotonic() + settings.ORDERS_FEED_TIMEOUT
+    while monotonic() < stream_until:
+        changes = order_changes.get_since(last_event_id, timeout=settings.ORDERS_FEED_KEEPALIVE)
+        if changes is None:
+            yield 'event: reload\ndata: {}\n\n'
+            return
+        last_event_id, orders_ids = changes
+        if not orders_ids:
+            yield ': keepalive\n\n'
+            continue
 
-        order.restaurants = sorted(
-            appropriate_restaurants, key=lambda restaurant: (restaurant.distance is None, restaurant.distance)
+        orders = list(
+            filter_orders(Order.objects.filter(id__in=orders_ids), **filters)
+            .calculate_order_price()
+            .select_related('place', 'restaurant')
         )
+        render_order_rows(orders, orders_url)
+        rows = {order.id: order.row for order in orders}
+        for order_id in orders_ids:
+            data = json.dumps({'id': order_id, 'html': rows.get(order_id)})
+            yield f'id: {last_event_id}\nevent: order\ndata: {data}\n\n'
+
+
+@user_passes_test(is_manager, login_url='restaurateur:login')
+def view_orders_feed(request):
+    query = request.GET.copy()
+    last_event_id = request.headers.get('Last-Event-ID') or query.pop('last_event_id', [''])[0]
+    filter_form = OrdersFilter(query)
+    filter_form.is_valid()
+    filters = {**filter_form.cleaned_data, 'after': None}
+
+    response = StreamingHttpResponse(
+        stream_orders_changes(
+            filters,
+            last_event_id or order_changes.last_event_id,
+            f"{reverse('restaurateur:view_orders')}?{query.urlencode()}",
+        ),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
-    return render(request, template_name='order_items.html', context={'orders': orders})
+
+@user_passes_test(is_manager, login_url='restaurateur:login')
+def view_geocoder_cache_stats(request):
+    return JsonResponse(coordinates_cache.get_stats())
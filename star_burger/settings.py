@@ -86,6 +86,13 @@ DATABASES = {
     )
 }
 
+# Shared by web and job worker processes: circuit breaker state, restaurants version, rendered order rows.
+CACHES = {
+    'default': env.dj_cache_url(
+        'CACHE_URL', 'file://{0}?max_entries=10000'.format(os.path.join(BASE_DIR, '.cache', 'django'))
+    ),
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -120,6 +127,45 @@ INTERNAL_IPS = [
     '127.0.0.1'
 ]
 
+YANDEX_API_KEY = env.str('YANDEX_API_KEY', '')
+GEOCODER = {
+    'BACKEND': env.str('GEOCODER_BACKEND', 'foodcartapp.geocoder.YandexGeocoder'),
+    'OPTIONS': env.json('GEOCODER_OPTIONS', '{}'),
+}
+GEOCODER_CACHE_SIZE = env.int('GEOCODER_CACHE_SIZE', 10000)
+GEOCODER_CACHE_TTL = env.int('GEOCODER_CACHE_TTL', 60 * 60)
+GEOCODER_THREADS = env.int('GEOCODER_THREADS', 8)
+GEOCODER_BATCH_TIMEOUT = env.float('GEOCODER_BATCH_TIMEOUT', 10)
+GEOCODER_CONNECT_TIMEOUT = env.float('GEOCODER_CONNECT_TIMEOUT', 3.05)
+GEOCODER_READ_TIMEOUT = env.float('GEOCODER_READ_TIMEOUT', 5)
+GEOCODER_FAILURE_THRESHOLD = env.int('GEOCODER_FAILURE_THRESHOLD', 5)
+GEOCODER_CIRCUIT_RESET_TIMEOUT = env.int('GEOCODER_CIRCUIT_RESET_TIMEOUT', 60)
+GEOCODER_ERROR_TTL = env.int('GEOCODER_ERROR_TTL', 5 * 60)
+GEOCODER_NOT_FOUND_TTL = env.int('GEOCODER_NOT_FOUND_TTL', 24 * 60 * 60)
+PLACE_MAX_AGE_DAYS = env.int('PLACE_MAX_AGE_DAYS', 30)
+GAZETTEER_PATH = env.str('GAZETTEER_PATH', '')
+GAZETTEER_MIN_SIMILARITY = env.float('GAZETTEER_MIN_SIMILARITY', 0.4)
+
+DISTANCE_EXACT_GEODESIC = env.bool('DISTANCE_EXACT_GEODESIC', False)
+RESTAURANT_INDEX_TTL = env.int('RESTAURANT_INDEX_TTL', 60)
+ORDER_RESTAURANTS_LIMIT = env.int('ORDER_RESTAURANTS_LIMIT', None)
+ORDER_RESTAURANTS_RADIUS_KM = env.float('ORDER_RESTAURANTS_RADIUS_KM', None)
+ORDERS_PAGE_SIZE = env.int('ORDERS_PAGE_SIZE', 50)
+ORDERS_FEED_TIMEOUT = env.int('ORDERS_FEED_TIMEOUT', 300)
+ORDERS_FEED_KEEPALIVE = env.int('ORDERS_FEED_KEEPALIVE', 15)
+ORDERS_FEED_POLL_INTERVAL = env.float('ORDERS_FEED_POLL_INTERVAL', 1)
+ORDER_CHANGES_RETENTION = env.int('ORDER_CHANGES_RETENTION', 24 * 60 * 60)
+ORDER_ROW_CACHE_TIMEOUT = env.int('ORDER_ROW_CACHE_TIMEOUT', 60 * 60)
+DISPATCH_LOAD_PENALTY_KM = env.float('DISPATCH_LOAD_PENALTY_KM', 1)
+LOAD_RECONCILE_INTERVAL = env.int('LOAD_RECONCILE_INTERVAL', 60)
+COURIER_CAPACITY = env.int('COURIER_CAPACITY', 4)
+ROUTING_TIME_BUDGET = env.float('ROUTING_TIME_BUDGET', 1)
+
+JOBS_MAX_ATTEMPTS = env.int('JOBS_MAX_ATTEMPTS', 5)
+JOBS_RETRY_DELAY = env.int('JOBS_RETRY_DELAY', 30)
+JOBS_LEASE_TIME = env.int('JOBS_LEASE_TIME', 5 * 60)
+JOBS_DONE_RETENTION_DAYS = env.float('JOBS_DONE_RETENTION_DAYS', 7)
+
 STATICFILES_DIRS = [
     os.path.join(BASE_DIR, "assets"),
     os.path.join(BASE_DIR, "bundles"),